@@ -5,6 +5,8 @@ from jose import jwt, JWTError
 from passlib.context import CryptContext
 import os
 
+from app.core.token_cache import decode_cached
+
 # WARNING: Replace this with an environment variable in production
 SECRET_KEY = os.getenv("SECRET_KEY", "super-secret-key")
 ALGORITHM = "HS256"
@@ -23,14 +25,19 @@ def get_password_hash(password: str) -> str:
 
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    # iat keys the principal cache (app.core.principals)
+    to_encode.update({"exp": now + expires_delta, "iat": now})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def _verify(token: str) -> dict:
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
 def decode_token(token: str):
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return decode_cached("app.auth", token, _verify)
     except JWTError:
         return None
 
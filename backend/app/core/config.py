@@ -24,10 +24,46 @@ class Settings(BaseSettings):
     JWT_SECRET: str = Field(default="dev-secret-change-me-please")
     JWT_ALG: str = Field(default="HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=60 * 24)  # 24h
+    # authenticated principals per (user, token issue time); see app.core.principals
+    PRINCIPAL_CACHE_TTL_SECONDS: float = Field(default=300)
+    PRINCIPAL_CACHE_SIZE: int = Field(default=10000)
+    # verified tokens kept by app.core.token_cache (least recently used are dropped)
+    TOKEN_CACHE_SIZE: int = Field(default=10000)
 
     # --- Database ---
     # For sqlite, alembic typically wants sqlite:///./app.db
     DATABASE_URL: str = Field(default="sqlite:///./app.db")
+    # async routes; derived from DATABASE_URL (aiosqlite / asyncpg) when unset
+    ASYNC_DATABASE_URL: Optional[str] = Field(default=None)
+    # per engine and per worker process; see app.core.db_pool
+    DB_POOL_SIZE: int = Field(default=5)
+    DB_MAX_OVERFLOW: int = Field(default=10)
+    DB_POOL_TIMEOUT: float = Field(default=30)  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = Field(default=1800)  # seconds; -1 keeps connections forever
+    DB_POOL_PRE_PING: bool = Field(default=True)
+
+    # --- SQLite (ignored for other databases) ---
+    # production: WAL + pragmas + single writer connection (app.core.sqlite) | default: driver defaults
+    SQLITE_PROFILE: str = Field(default="production")
+    SQLITE_BUSY_TIMEOUT_MS: int = Field(default=5000)
+    SQLITE_MMAP_SIZE: int = Field(default=256 * 1024 * 1024)
+    SQLITE_CACHE_SIZE_KB: int = Field(default=64 * 1024)
+
+    # --- Service event log ---
+    # closed service days are archived here as <company_id>/<YYYY-MM-DD>.ndjson.gz
+    EVENT_ARCHIVE_DIR: str = Field(default="./event_archive")
+    # inline: events commit with the state change | write_behind: see app.services.event_journal
+    EVENT_JOURNAL_MODE: str = Field(default="inline")
+    EVENT_JOURNAL_SPOOL: str = Field(default="./event_journal.ndjson")
+    EVENT_JOURNAL_QUEUE_SIZE: int = Field(default=10000)
+    EVENT_JOURNAL_BATCH_SIZE: int = Field(default=500)
+    EVENT_JOURNAL_FLUSH_SECONDS: float = Field(default=0.2)
+
+    # --- Service day ---
+    # how often open tables of past service days are closed out (0 = never).
+    # Off by default: set each company's timezone/cutoff (PATCH /api/companies/{id})
+    # before turning it on, or their late tables get closed mid-service.
+    SERVICE_ROLLOVER_SECONDS: float = Field(default=0)
 
     # --- CORS ---
     # Allow comma-separated list OR *
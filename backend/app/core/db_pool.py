@@ -0,0 +1,122 @@
+# backend/app/core/db_pool.py
+"""
+Connection pool settings and telemetry shared by the sync and async engines.
+
+pool_options() turns the DB_POOL_* settings into create_engine() kwargs and
+swaps in a QueuePool subclass that times every checkout. pool_stats() is what
+GET /service/db/pool reports: pool size, connections checked out, overflow in
+use, checkout wait times and how many checkouts timed out. Size workers so
+that workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays below the database's
+max_connections.
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+from app.core.sqlite import is_memory_sqlite
+
+
+class PoolTelemetry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def record(self, wait_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
+
+
+class _TimedPool:
+    """Times _do_get(): waiting for a free connection, or opening a new one."""
+
+    telemetry: PoolTelemetry
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.telemetry.record_timeout()
+            raise
+        self.telemetry.record((time.perf_counter() - started) * 1000)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting across it
+        pool = super().recreate()
+        pool.telemetry = self.telemetry
+        return pool
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(
+    url: str,
+    is_async: bool = False,
+    size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+) -> dict:
+    """create_engine() kwargs for `url` from the DB_POOL_* settings (`size`/`max_overflow` override them)."""
+    if is_memory_sqlite(url):
+        # one shared connection per process/thread; there is nothing to size
+        return {}
+    return {
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE if size is None else size,
+        "max_overflow": settings.DB_MAX_OVERFLOW if max_overflow is None else max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def pool_stats(engine: Engine) -> Dict[str, object]:
+    pool = engine.pool
+    out: Dict[str, object] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        out.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            # negative while the pool hasn't opened pool_size connections yet
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    telemetry = getattr(pool, "telemetry", None)
+    if telemetry is not None:
+        out.update(telemetry.stats())
+    return out
@@ -0,0 +1,141 @@
+# backend/app/core/principals.py
+"""
+Authenticated principals and their in-process cache.
+
+Access tokens carry the user's id, role and company_id as signed claims next
+to `sub` and `iat`, so a request can be authorized without reading `users`.
+Principals are cached per (sub, iat) for PRINCIPAL_CACHE_TTL_SECONDS.
+
+Claims are only trusted while the token is younger than that TTL. After that
+the principal is loaded from `users` (and cached for another TTL), so a role
+or company change reaches every worker process within one TTL, even those
+that never saw the update.
+
+In the worker that makes the change (see the User listeners below),
+invalidate() takes effect at once: it drops the user's cached principals and
+stops trusting the claims of their tokens issued before the change.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect
+
+from app.core.config import settings
+from app.models.user import User
+
+CacheKey = Tuple[str, Optional[int]]
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    role: str
+    company_id: Optional[int]
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        role = getattr(user.role, "value", user.role)
+        return cls(id=user.id, username=user.username, role=role, company_id=user.company_id)
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> Optional["Principal"]:
+        """None for tokens issued before role/company claims existed."""
+        if not {"uid", "role", "company_id"} <= claims.keys():
+            return None
+        return cls(id=claims["uid"], username=claims["sub"], role=claims["role"], company_id=claims["company_id"])
+
+
+def principal_claims(user: User) -> dict:
+    """Claims create_access_token() needs so the token can be authorized from the cache."""
+    p = Principal.from_user(user)
+    return {"sub": p.username, "uid": p.id, "role": p.role, "company_id": p.company_id}
+
+
+class PrincipalCache:
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[CacheKey, Tuple[float, Principal]] = {}
+        # username -> time of their last role/company change
+        self._changed_at: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sub: str, iat: Optional[int]) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get((sub, iat))
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, sub: str, iat: Optional[int], principal: Principal, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict()
+            self._entries[(sub, iat)] = (time.monotonic() + ttl, principal)
+
+    def claims_ttl(self, iat: int) -> float:
+        """How much longer claims issued at `iat` are trusted."""
+        return iat + self.ttl_seconds - time.time()
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+        # still full: drop the oldest entries (dicts keep insertion order)
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def trusts_claims(self, sub: str, iat: Optional[int]) -> bool:
+        """
+        False once the token is older than the TTL: changes made by other
+        workers are invisible here, so older claims are re-checked against
+        the database. Also False when the token predates a role/company change
+        this worker saw.
+        """
+        if iat is None or self.claims_ttl(iat) <= 0:
+            return False
+        with self._lock:
+            return iat >= self._changed_at.get(sub, 0.0)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._changed_at[username] = time.time()
+            for key in [k for k in self._entries if k[0] == username]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._changed_at.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_TTL_SECONDS, settings.PRINCIPAL_CACHE_SIZE)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_change(mapper, connection, user: User):
+    state = inspect(user)
+    if any(state.attrs[name].history.has_changes() for name in ("role", "company_id", "username")):
+        principal_cache.invalidate(user.username)
+        # a renamed user's old tokens must not resolve to their old principal
+        old = state.attrs.username.history.deleted
+        if old:
+            principal_cache.invalidate(old[0])
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_delete(mapper, connection, user: User):
+    principal_cache.invalidate(user.username)
@@ -8,6 +8,7 @@ import jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.token_cache import decode_cached
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -47,5 +48,10 @@ def create_access_token(
 def decode_token(token: str) -> Dict[str, Any]:
     """
     Decodes & validates a token. Raises jwt exceptions if invalid.
+    Verified tokens are cached until they expire (app.core.token_cache).
     """
+    return decode_cached("app.core.security", token, _verify)
+
+
+def _verify(token: str) -> Dict[str, Any]:
     return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
@@ -0,0 +1,185 @@
+# backend/app/core/sqlite.py
+"""
+SQLite production profile (SQLITE_PROFILE=production, the default).
+
+Every connection gets WAL, synchronous=NORMAL, a busy timeout, mmap and a
+larger page cache. Writes go through one SQLiteWriter per worker: a thread
+that owns the only write connection and starts its transactions with BEGIN
+IMMEDIATE. Write requests take turns on it instead of racing each other, and
+a read-then-write transaction can't fail with "database is locked" when it
+upgrades to a write. Readers use the async pool and, with WAL, never wait on
+the writer.
+
+The writer runs whole crud calls on its thread with the sync driver, so a
+write costs one thread hop instead of one per statement as on aiosqlite.
+
+Writers outside a request use app.db.WriteSessionLocal. In a worker process
+that covers the event journal flusher and the service-day rollover. Their
+sessions check out the writer's single connection, so they wait for it
+between requests instead of competing for the database lock. Scripts run in
+their own process (e.g. scripts.archive_service_events) and can't share that
+connection. They still start their transactions with BEGIN IMMEDIATE and
+honour the busy timeout, so they queue on the lock rather than fail halfway
+through a read-then-write.
+
+Benchmark: py -m scripts.bench_sqlite_writes
+"""
+import asyncio
+import queue
+import threading
+from typing import Callable, List, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def is_memory_sqlite(url: str) -> bool:
+    return is_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+
+def production_profile(url: str, profile: Optional[str] = None) -> bool:
+    # an in-memory database is private to its connection, a second writer engine can't share it
+    profile = profile or settings.SQLITE_PROFILE
+    return is_sqlite(url) and not is_memory_sqlite(url) and profile == "production"
+
+
+def pragmas() -> List[str]:
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+        # negative cache_size is in KiB
+        f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}",
+    ]
+
+
+def apply_pragmas(engine: Engine):
+    """Run the profile's pragmas on every new connection of `engine` (async engines: pass .sync_engine)."""
+    statements = pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def begin_immediate(engine: Engine):
+    """Take the write lock when a transaction starts instead of at its first write."""
+
+    @event.listens_for(engine, "connect")
+    def _manual_transactions(dbapi_conn, record):
+        # stop the driver from issuing its own deferred BEGIN
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _resolve(fut: asyncio.Future, result=None, error: Optional[BaseException] = None):
+    # the awaiting request may have been cancelled meanwhile
+    if fut.done():
+        return
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(result)
+
+
+class SQLiteWriter:
+    """The one thread (and connection) of a worker that writes to SQLite."""
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self._jobs: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._turns = {}  # event loop -> asyncio.Lock
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            loop, fut, fn, args, kwargs = job
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                loop.call_soon_threadsafe(_resolve, fut, None, e)
+            else:
+                loop.call_soon_threadsafe(_resolve, fut, result)
+
+    async def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run fn(*args, **kwargs) on the writer thread."""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._jobs.put((loop, fut, fn, args, kwargs))
+        return await fut
+
+    def turn(self) -> asyncio.Lock:
+        """Held by a write session from its first call until close(), so requests never interleave."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._turns:
+            self._turns[loop] = asyncio.Lock()
+        return self._turns[loop]
+
+    def session(self) -> "WriterSession":
+        return WriterSession(self)
+
+    def stop(self):
+        with self._start_lock:
+            if self._thread is not None:
+                self._jobs.put(None)
+                self._thread.join()
+                self._thread = None
+
+
+class WriterSession:
+    """
+    What write routes get instead of an AsyncSession under the production
+    profile. It only offers run_sync() and close(), which is all the
+    app.crud.service_async functions use: run_sync(fn, ...) calls fn with
+    the request's sync Session on the writer thread.
+    """
+
+    def __init__(self, writer: SQLiteWriter):
+        self._writer = writer
+        self._db: Optional[Session] = None
+        self._turn: Optional[asyncio.Lock] = None
+
+    async def run_sync(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        if self._turn is None:
+            turn = self._writer.turn()
+            await turn.acquire()
+            self._turn = turn
+        if self._db is None:
+            self._db = self._writer.session_factory()
+        return await self._writer.call(fn, self._db, *args, **kwargs)
+
+    async def close(self):
+        try:
+            if self._db is not None:
+                db, self._db = self._db, None
+                await self._writer.call(db.close)
+        finally:
+            if self._turn is not None:
+                turn, self._turn = self._turn, None
+                turn.release()
@@ -0,0 +1,80 @@
+# backend/app/core/token_cache.py
+"""
+Verified JWTs, so a token is only signature-checked and parsed once.
+
+A tablet sends the same bearer token with every tap of a shift. The first
+request verifies it as usual; later ones find its claims here, keyed by the
+exact token string, until the token's `exp` passes or it's pushed out of the
+TOKEN_CACHE_SIZE least recently used entries. Invalid tokens are never
+cached, so they keep failing verification.
+
+app.auth (python-jose) and app.core.security (PyJWT) share the one cache,
+each under its own scope, because they sign with different secrets.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+Claims = Dict[str, Any]
+
+
+class TokenCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (scope, token) -> (exp as unix time or None, claims)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Optional[float], Claims]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope: str, token: str) -> Optional[Claims]:
+        key = (scope, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.time()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, scope: str, token: str, claims: Claims):
+        exp = claims.get("exp")
+        with self._lock:
+            self._entries[(scope, token)] = (float(exp) if exp is not None else None, dict(claims))
+            self._entries.move_to_end((scope, token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+verified_tokens = TokenCache(settings.TOKEN_CACHE_SIZE)
+
+
+def decode_cached(scope: str, token: str, decode: Callable[[str], Claims]) -> Claims:
+    """Claims of `token` from the cache, else decode(token), which must raise for invalid tokens."""
+    claims = verified_tokens.get(scope, token)
+    if claims is None:
+        claims = decode(token)
+        verified_tokens.put(scope, token, claims)
+    return claims
@@ -1,20 +1,34 @@
 # backend/app/crud/service.py
+import base64
 import json
-from datetime import date, datetime
-from typing import Optional
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
 
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import and_, desc, func, insert, or_, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.models.company import Company
+from app.services.event_bus import ServiceEvent, event_bus
+from app.services.event_journal import event_journal, event_row
+from app.services.table_replay import GUEST_FIELDS, SNAPSHOT_EVERY, TABLE_FIELDS, table_state
 from app.models.service import (
     ServiceTable,
     ServiceGuest,
     ServiceTableWine,
     ServiceStepEvent,
+    ServiceTableSnapshot,
     TableStatus,
     StepEventType,
+    payload_key,
 )
+from app.schemas.service import event_payload
 
 
 class TableUseConflictError(Exception):
@@ -25,8 +39,116 @@ class InvalidTurnError(Exception):
     """Raised when turn is not 1 or 2."""
 
 
+class BatchOperationError(Exception):
+    """Raised when one op of a batch can't be applied; the whole batch is discarded."""
+
+    def __init__(self, index: int, message: str):
+        super().__init__(f"ops[{index}]: {message}")
+        self.index = index
+
+
+class BatchTargetNotFoundError(BatchOperationError):
+    """Raised when a batch op references a guest or wine entry that isn't on the table."""
+
+
+class BatchWinesLockedError(BatchOperationError):
+    """Raised when a batch op touches wines before the table has arrived."""
+
+
+class StaleTableError(Exception):
+    """Raised when the table was changed by someone else since it was loaded (or since the client's If-Match)."""
+
+
+# company service-day settings change rarely; re-read them at most this often
+SERVICE_DAY_CACHE_SECONDS = 60
+_service_day_settings: Dict[int, Tuple[float, str, int]] = {}
+
+
+def company_service_day(tz: str, cutoff_hour: int, now: Optional[datetime] = None) -> date:
+    """The service day `now` (aware, default: current time) falls in for a company's settings."""
+    local = (now or datetime.now(timezone.utc)).astimezone(ZoneInfo(tz))
+    return (local - timedelta(hours=cutoff_hour)).date()
+
+
+def current_service_day(db: Session, company_id: int) -> date:
+    """Default service_date for a company's floor queries and new tables."""
+    cached = _service_day_settings.get(company_id)
+    if cached is None or cached[0] < time.monotonic():
+        row = db.query(Company.timezone, Company.service_day_cutoff_hour).filter(Company.id == company_id).first()
+        tz, cutoff_hour = row if row else ("UTC", 0)
+        cached = (time.monotonic() + SERVICE_DAY_CACHE_SECONDS, tz, cutoff_hour)
+        _service_day_settings[company_id] = cached
+    return company_service_day(cached[1], cached[2])
+
+
+def forget_service_day(company_id: int):
+    """Drop a company's cached settings after they change; other workers catch up within SERVICE_DAY_CACHE_SECONDS."""
+    _service_day_settings.pop(company_id, None)
+
+
 def touch(table: ServiceTable):
     table.updated_at = datetime.utcnow()
+    table.version = (table.version or 0) + 1
+
+
+def check_version(table: ServiceTable, expected_version: Optional[int]):
+    if expected_version is not None and table.version != expected_version:
+        raise StaleTableError(f"Table is at version {table.version}, not {expected_version}")
+
+
+def publish_events(table: ServiceTable, events: Sequence[ServiceStepEvent]):
+    """Publish a committed mutation of `table` on the in-process event bus."""
+    status = TableStatus(table.status).value
+    bus_events = []
+    for ev in events:
+        payload = ev.payload or {}
+        bus_events.append(
+            ServiceEvent(
+                company_id=table.company_id,
+                table_id=table.id,
+                event_type=StepEventType(ev.event_type).value,
+                from_step=ev.from_step,
+                to_step=ev.to_step,
+                guest_id=payload.get("guest_id"),
+                wine_entry_id=payload.get("wine_entry_id"),
+                actor_user_id=ev.actor_user_id,
+                step_index=table.step_index,
+                status=status,
+                updated_at=table.updated_at,
+                version=table.version,
+            )
+        )
+    event_bus.publish(bus_events)
+
+
+def stage_events(db: Session, events: Sequence[ServiceStepEvent]) -> List[dict]:
+    """
+    Add the events to the current commit, or, with the write-behind journal
+    enabled, return their rows for event_journal.append() after the commit.
+    """
+    if not event_journal.enabled:
+        db.add_all(events)
+        return []
+    now = datetime.utcnow()
+    for ev in events:
+        ev.id = ev.id or str(uuid.uuid4())
+        ev.created_at = ev.created_at or now
+    return [event_row(ev) for ev in events]
+
+
+def creation_values(table: ServiceTable) -> dict:
+    return {f: getattr(table, f) for f in TABLE_FIELDS}
+
+
+def insert_event_rows(db: Session, rows: List[dict]) -> List[dict]:
+    """
+    executemany INSERT of complete service_step_events rows, or, with the
+    write-behind journal enabled, return them for event_journal.append() after the commit.
+    """
+    if event_journal.enabled:
+        return rows
+    db.execute(insert(ServiceStepEvent), rows)
+    return []
 
 
 def create_table(
@@ -37,9 +159,9 @@ def create_table(
     location: Optional[str],
     guest_count: int,
     notes: Optional[str],
+    service_date: Optional[date] = None,
 ):
-    # ✅ Best option for testing: always 1-day service = "today"
-    service_date = date.today()
+    service_date = service_date or current_service_day(db, company_id)
 
     # ✅ enforce reuse max twice
     if turn not in (1, 2):
@@ -53,7 +175,10 @@ def create_table(
         location=location,
         guest_count=guest_count,
         notes=notes,
+        guests=[],
+        wines=[],
     )
+    touch(t)
 
     db.add(t)
     try:
@@ -64,19 +189,241 @@ def create_table(
             f"Table {table_number} turn {turn} already exists for {service_date}."
         ) from e
 
-    touch(t)
-    db.add(
-        ServiceStepEvent(
-            table_id=t.id,
-            event_type=StepEventType.UPDATE,
-            payload=json.dumps({"created": True, "service_date": service_date.isoformat()}),
-        )
+    ev = ServiceStepEvent(
+        table_id=t.id,
+        company_id=company_id,
+        service_date=service_date,
+        event_type=StepEventType.UPDATE,
+        payload=event_payload(
+            StepEventType.UPDATE,
+            created=True,
+            service_date=service_date,
+            values=creation_values(t),
+        ),
     )
+    journal_rows = stage_events(db, [ev])
     db.commit()
-    db.refresh(t)
+    event_journal.append(journal_rows)
+    publish_events(t, [ev])
     return t
 
 
+TABLE_USE_KEY = ("company_id", "service_date", "table_number", "turn")
+
+# keep NULL columns in the statement so rows with/without optional fields share one executemany
+BULK_INSERT_OPTIONS = {"render_nulls": True}
+
+
+def _insert_tables_skipping_conflicts(db: Session, rows: List[dict]) -> List[ServiceTable]:
+    """
+    executemany INSERT of service_tables rows; rows that collide with
+    uq_table_use_per_day are skipped and simply missing from the result.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert_fn = sqlite_insert if dialect == "sqlite" else pg_insert
+        stmt = insert_fn(ServiceTable).on_conflict_do_nothing(index_elements=list(TABLE_USE_KEY))
+        return list(db.scalars(stmt.returning(ServiceTable), rows, execution_options=BULK_INSERT_OPTIONS))
+
+    # no ON CONFLICT: filter known conflicts first, a concurrent writer still fails the batch
+    existing = {
+        (n, t)
+        for n, t in db.query(ServiceTable.table_number, ServiceTable.turn).filter(
+            ServiceTable.company_id == rows[0]["company_id"],
+            ServiceTable.service_date == rows[0]["service_date"],
+            tuple_(ServiceTable.table_number, ServiceTable.turn).in_([(r["table_number"], r["turn"]) for r in rows]),
+        )
+    }
+    rows = [r for r in rows if (r["table_number"], r["turn"]) not in existing]
+    if not rows:
+        return []
+    return list(db.scalars(insert(ServiceTable).returning(ServiceTable), rows, execution_options=BULK_INSERT_OPTIONS))
+
+
+def create_tables_bulk(
+    db: Session,
+    company_id: int,
+    tables: List[dict],
+    actor_user_id: Optional[int],
+    service_date: Optional[date] = None,
+):
+    """
+    Create a whole floor plan in one transaction.
+
+    Tables and their creation events are written with executemany. Rows with an
+    invalid turn, duplicated within the request, or already used for the day are
+    reported in `conflicts` (index into `tables` + reason) instead of failing the batch.
+    Returns (created_tables, conflicts).
+    """
+    service_date = service_date or current_service_day(db, company_id)
+    now = datetime.utcnow()
+
+    conflicts = []
+    rows = []
+    index_by_key = {}
+    for i, data in enumerate(tables):
+        key = (data["table_number"], data.get("turn", 1))
+        if key[1] not in (1, 2):
+            conflicts.append({"index": i, "table_number": key[0], "turn": key[1], "detail": "turn must be 1 or 2"})
+            continue
+        if key in index_by_key:
+            conflicts.append(
+                {"index": i, "table_number": key[0], "turn": key[1], "detail": "Duplicate of an earlier row in this request."}
+            )
+            continue
+        index_by_key[key] = i
+        rows.append(
+            {
+                "company_id": company_id,
+                "service_date": service_date,
+                "table_number": key[0],
+                "turn": key[1],
+                "location": data.get("location"),
+                "guest_count": data.get("guest_count", 0),
+                "notes": data.get("notes"),
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+
+    created = _insert_tables_skipping_conflicts(db, rows) if rows else []
+
+    created_keys = {(t.table_number, t.turn) for t in created}
+    for key, i in index_by_key.items():
+        if key not in created_keys:
+            conflicts.append(
+                {
+                    "index": i,
+                    "table_number": key[0],
+                    "turn": key[1],
+                    "detail": f"Table {key[0]} turn {key[1]} already exists for {service_date}.",
+                }
+            )
+
+    journal_rows = []
+    if created:
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "table_id": t.id,
+                "company_id": company_id,
+                "service_date": service_date,
+                "event_type": StepEventType.UPDATE.value,
+                "from_step": None,
+                "to_step": None,
+                "payload": event_payload(
+                    StepEventType.UPDATE,
+                    created=True,
+                    service_date=service_date,
+                    values=creation_values(t),
+                ),
+                "actor_user_id": actor_user_id,
+                "created_at": datetime.utcnow(),
+            }
+            for t in created
+        ]
+        journal_rows = insert_event_rows(db, rows)
+
+    db.commit()
+    event_journal.append(journal_rows)
+    created.sort(key=lambda t: index_by_key[(t.table_number, t.turn)])
+    for t in created:
+        publish_events(t, [ServiceStepEvent(event_type=StepEventType.UPDATE, actor_user_id=actor_user_id)])
+    conflicts.sort(key=lambda c: c["index"])
+    return created, conflicts
+
+
+def close_out_day(
+    db: Session,
+    company_id: int,
+    service_date: date,
+    actor_user_id: Optional[int] = None,
+) -> list:
+    """
+    Complete every table still open for the company and day: one set-based
+    UPDATE plus one executemany of COMPLETE events. Returns the closed tables'
+    step state rows.
+    """
+    now = datetime.utcnow()
+    stmt = (
+        update(ServiceTable)
+        .where(
+            ServiceTable.company_id == company_id,
+            ServiceTable.service_date == service_date,
+            ServiceTable.status == TableStatus.OPEN.value,
+        )
+        .values(
+            status=TableStatus.COMPLETED.value,
+            completed_at=func.coalesce(ServiceTable.completed_at, now),
+            updated_at=now,
+            version=ServiceTable.version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        closed = db.execute(stmt.returning(*STEP_STATE_COLUMNS)).all()
+    else:
+        ids = [
+            i
+            for (i,) in db.query(ServiceTable.id).filter(
+                ServiceTable.company_id == company_id,
+                ServiceTable.service_date == service_date,
+                ServiceTable.status == TableStatus.OPEN.value,
+            )
+        ]
+        if ids:
+            db.execute(stmt.where(ServiceTable.id.in_(ids)))
+        closed = db.query(*STEP_STATE_COLUMNS).filter(ServiceTable.id.in_(ids)).all() if ids else []
+
+    if not closed:
+        db.rollback()
+        return []
+
+    payload = event_payload(StepEventType.COMPLETE, closed_out=True)
+    journal_rows = insert_event_rows(
+        db,
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "table_id": row.id,
+                "company_id": company_id,
+                "service_date": service_date,
+                "event_type": StepEventType.COMPLETE.value,
+                "from_step": None,
+                "to_step": None,
+                "payload": payload,
+                "actor_user_id": actor_user_id,
+                "created_at": now,
+            }
+            for row in closed
+        ],
+    )
+    db.commit()
+    event_journal.append(journal_rows)
+    for row in closed:
+        publish_events(row, [ServiceStepEvent(event_type=StepEventType.COMPLETE, actor_user_id=actor_user_id)])
+    return closed
+
+
+def close_out_before(db: Session, before: Optional[date] = None, actor_user_id: Optional[int] = None) -> dict:
+    """
+    Service-day rollover: close out every day before `before` that still has
+    open tables. Without `before`, each company's own current service day is used.
+    """
+    # no company's service day is ahead of tomorrow's UTC date
+    limit = before or datetime.now(timezone.utc).date() + timedelta(days=1)
+    days = (
+        db.query(ServiceTable.company_id, ServiceTable.service_date)
+        .filter(ServiceTable.status == TableStatus.OPEN.value, ServiceTable.service_date < limit)
+        .distinct()
+        .order_by(ServiceTable.service_date, ServiceTable.company_id)
+        .all()
+    )
+    if before is None:
+        days = [(c, d) for c, d in days if d < current_service_day(db, c)]
+    return {(c, d): len(close_out_day(db, c, d, actor_user_id)) for c, d in days}
+
+
 def get_table(db: Session, table_id: str, company_id: Optional[int] = None) -> Optional[ServiceTable]:
     q = db.query(ServiceTable).filter(ServiceTable.id == table_id)
     if company_id is not None:
@@ -84,6 +431,59 @@ def get_table(db: Session, table_id: str, company_id: Optional[int] = None) -> O
     return q.first()
 
 
+def get_table_detail(db: Session, table_id: str, company_id: Optional[int] = None) -> Optional[ServiceTable]:
+    """
+    Load a table together with its guests and wines for TableDetail responses.
+    Guests are joined into the table SELECT and wines come from one selectin query,
+    so serializing the response never triggers lazy loads.
+    """
+    q = (
+        db.query(ServiceTable)
+        .options(joinedload(ServiceTable.guests), selectinload(ServiceTable.wines))
+        .filter(ServiceTable.id == table_id)
+    )
+    if company_id is not None:
+        q = q.filter(ServiceTable.company_id == company_id)
+    return q.one_or_none()
+
+
+def get_table_version(db: Session, table_id: str, company_id: Optional[int] = None) -> Optional[int]:
+    """Cheap single-column lookup used to answer conditional GETs without loading the table."""
+    q = db.query(ServiceTable.version).filter(ServiceTable.id == table_id)
+    if company_id is not None:
+        q = q.filter(ServiceTable.company_id == company_id)
+    row = q.first()
+    return row[0] if row else None
+
+
+def get_tables_max_updated_at(db: Session, company_id: int, service_date: Optional[date] = None) -> Optional[datetime]:
+    """
+    Newest updated_at over all of a company's tables (of one day), regardless of
+    status, so a table leaving a filtered list (e.g. completed) still changes the value.
+    """
+    q = db.query(func.max(ServiceTable.updated_at)).filter(ServiceTable.company_id == company_id)
+    if service_date is not None:
+        q = q.filter(ServiceTable.service_date == service_date)
+    return q.scalar()
+
+
+class InvalidCursorError(Exception):
+    """Raised when a list_tables cursor can't be decoded."""
+
+
+def encode_cursor(table: ServiceTable) -> str:
+    raw = json.dumps({"u": table.updated_at.isoformat(), "id": table.id})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(data["u"]), str(data["id"])
+    except Exception as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+
 def list_tables(
     db: Session,
     company_id: Optional[int],
@@ -91,252 +491,653 @@ def list_tables(
     page: int,
     limit: int,
     updated_since: Optional[datetime],
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    service_date: Optional[date] = None,
 ):
+    """
+    List tables newest-first by (updated_at, id), optionally for one service day.
+
+    With `cursor` (the `next_cursor` of a previous page) this is keyset
+    pagination served straight from ix_service_tables_company_day_status_updated;
+    `page` is only used for legacy OFFSET paging when no cursor is given.
+    The COUNT is skipped when include_total is False.
+    Returns (total, items, next_cursor).
+    """
     q = db.query(ServiceTable).filter(ServiceTable.status == status)
     if company_id is not None:
         q = q.filter(ServiceTable.company_id == company_id)
+    if service_date is not None:
+        q = q.filter(ServiceTable.service_date == service_date)
     if updated_since:
         q = q.filter(ServiceTable.updated_at >= updated_since)
 
-    total = q.count()
-    items = (
-        q.order_by(desc(ServiceTable.updated_at))
-        .offset((page - 1) * limit)
-        .limit(limit)
-        .all()
-    )
-    return total, items
+    total = q.count() if include_total else None
 
+    if cursor:
+        after_updated_at, after_id = decode_cursor(cursor)
+        q = q.filter(
+            or_(
+                ServiceTable.updated_at < after_updated_at,
+                and_(ServiceTable.updated_at == after_updated_at, ServiceTable.id < after_id),
+            )
+        )
+    elif page > 1:
+        q = q.offset((page - 1) * limit)
 
-def patch_table(db: Session, table: ServiceTable, data: dict, actor_user_id: Optional[int]):
-    for k, v in data.items():
-        setattr(table, k, v)
+    # one extra row tells us whether there is a next page
+    items = q.order_by(desc(ServiceTable.updated_at), desc(ServiceTable.id)).limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1])
+    return total, items, next_cursor
 
-    touch(table)
-    db.add(
-        ServiceStepEvent(
-            table_id=table.id,
-            event_type=StepEventType.UPDATE,
-            payload=json.dumps({"fields": list(data.keys())}),
-            actor_user_id=actor_user_id,
-        )
-    )
 
+# Changes committed just before a sync read can carry timestamps slightly older
+# than the read itself; re-send this window on the next poll rather than miss them.
+# The write-behind journal adds its own lag, see sync_overlap().
+SYNC_OVERLAP = timedelta(seconds=2)
+
+
+def sync_overlap() -> timedelta:
+    # tombstones come from event rows, which the journal may insert late
+    return SYNC_OVERLAP + event_journal.max_lag()
+
+
+def encode_sync_cursor(as_of: datetime) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"t": as_of.isoformat()}).encode()).decode()
+
+
+def decode_sync_cursor(cursor: str) -> datetime:
     try:
-        db.commit()
-    except IntegrityError as e:
-        db.rollback()
-        raise TableUseConflictError(
-            "That table_number/turn/service_date is already used for this company."
-        ) from e
+        return datetime.fromisoformat(json.loads(base64.urlsafe_b64decode(cursor.encode()))["t"])
+    except Exception as e:
+        raise InvalidCursorError("Invalid cursor") from e
 
-    db.refresh(table)
-    return table
 
+def list_changes(db: Session, company_id: int, since: Optional[datetime], service_date: Optional[date] = None):
+    """
+    Everything a tablet needs to catch up since `since`, scoped to one company.
 
-def mark_arrived(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
+    Returns a dict with changed `tables`, `guests`, `wines`, tombstones for
+    removed guests/wines (taken from the GUEST_REMOVE/WINE_REMOVE step events)
+    and the `as_of` time to hand back as the next cursor. Without `since`
+    this is a full snapshot of the open floor and carries no tombstones.
+    Rows may repeat across polls (see sync_overlap()); clients upsert by id.
+    """
+    as_of = datetime.utcnow()
+    # never hand out a cursor past events this process hasn't flushed yet
+    pending = event_journal.pending_since()
+    if pending is not None:
+        # the next poll reads created_at > cursor, so stop just short of it
+        as_of = min(as_of, pending - timedelta(microseconds=1))
+
+    tables_q = db.query(ServiceTable).filter(ServiceTable.company_id == company_id)
+    guests_q = db.query(ServiceGuest).join(ServiceTable).filter(ServiceTable.company_id == company_id)
+    wines_q = db.query(ServiceTableWine).join(ServiceTable).filter(ServiceTable.company_id == company_id)
+
+    if service_date is not None:
+        tables_q = tables_q.filter(ServiceTable.service_date == service_date)
+        guests_q = guests_q.filter(ServiceTable.service_date == service_date)
+        wines_q = wines_q.filter(ServiceTable.service_date == service_date)
+
+    deleted_guests = []
+    deleted_wines = []
+
+    if since is None:
+        tables_q = tables_q.filter(ServiceTable.status == TableStatus.OPEN)
+        guests_q = guests_q.filter(ServiceTable.status == TableStatus.OPEN)
+        wines_q = wines_q.filter(ServiceTable.status == TableStatus.OPEN)
+    else:
+        since = since - sync_overlap()
+        tables_q = tables_q.filter(ServiceTable.updated_at > since)
+        guests_q = guests_q.filter(ServiceGuest.updated_at > since)
+        wines_q = wines_q.filter(ServiceTableWine.updated_at > since)
+
+        removals_q = (
+            db.query(ServiceStepEvent)
+            .filter(ServiceStepEvent.company_id == company_id)
+            .filter(ServiceStepEvent.event_type.in_([StepEventType.GUEST_REMOVE, StepEventType.WINE_REMOVE]))
+            .filter(ServiceStepEvent.created_at > since)
+        )
+        if service_date is not None:
+            removals_q = removals_q.filter(ServiceStepEvent.service_date == service_date)
+        removals = removals_q.order_by(ServiceStepEvent.created_at).all()
+        for ev in removals:
+            payload = ev.payload or {}
+            if ev.event_type == StepEventType.GUEST_REMOVE:
+                deleted_guests.append({"id": payload.get("guest_id"), "table_id": ev.table_id, "deleted_at": ev.created_at})
+            else:
+                deleted_wines.append({"id": payload.get("wine_entry_id"), "table_id": ev.table_id, "deleted_at": ev.created_at})
+
+    return {
+        "tables": tables_q.order_by(ServiceTable.updated_at).all(),
+        "guests": guests_q.order_by(ServiceGuest.updated_at).all(),
+        "wines": wines_q.order_by(ServiceTableWine.updated_at).all(),
+        "deleted_guests": deleted_guests,
+        "deleted_wines": deleted_wines,
+        "as_of": as_of,
+    }
+
+
+def find_events(
+    db: Session,
+    company_id: int,
+    event_type: Optional[StepEventType] = None,
+    table_id: Optional[str] = None,
+    guest_id: Optional[str] = None,
+    wine_entry_id: Optional[str] = None,
+    wine_id: Optional[str] = None,
+    limit: int = 200,
+) -> List[ServiceStepEvent]:
+    """Audit search over the live event log, newest first; payload keys are filtered in SQL."""
+    q = db.query(ServiceStepEvent).filter(ServiceStepEvent.company_id == company_id)
+    if event_type is not None:
+        q = q.filter(ServiceStepEvent.event_type == event_type)
+    if table_id:
+        q = q.filter(ServiceStepEvent.table_id == table_id)
+    if guest_id:
+        q = q.filter(payload_key("guest_id") == guest_id)
+    if wine_entry_id:
+        q = q.filter(payload_key("wine_entry_id") == wine_entry_id)
+    if wine_id:
+        q = q.filter(payload_key("wine_id") == wine_id)
+    return q.order_by(desc(ServiceStepEvent.created_at), desc(ServiceStepEvent.id)).limit(limit).all()
+
+
+def _apply_patch(table: ServiceTable, data: dict, actor_user_id: Optional[int]) -> ServiceStepEvent:
+    for k, v in data.items():
+        setattr(table, k, v)
+
+    return ServiceStepEvent(
+        table_id=table.id,
+        event_type=StepEventType.UPDATE,
+        payload=event_payload(StepEventType.UPDATE, fields=list(data.keys()), values=data),
+        actor_user_id=actor_user_id,
+    )
+
+
+def _apply_arrive(table: ServiceTable, actor_user_id: Optional[int]) -> ServiceStepEvent:
     if not table.arrived_at:
         table.arrived_at = datetime.utcnow()
-    touch(table)
-    db.add(ServiceStepEvent(table_id=table.id, event_type=StepEventType.ARRIVE, actor_user_id=actor_user_id))
-    db.commit()
-    db.refresh(table)
-    return table
+    return ServiceStepEvent(table_id=table.id, event_type=StepEventType.ARRIVE, actor_user_id=actor_user_id)
 
 
-def mark_seated(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
+def _apply_seat(table: ServiceTable, actor_user_id: Optional[int]) -> ServiceStepEvent:
     if not table.seated_at:
         table.seated_at = datetime.utcnow()
-    touch(table)
-    db.add(ServiceStepEvent(table_id=table.id, event_type=StepEventType.SEAT, actor_user_id=actor_user_id))
-    db.commit()
-    db.refresh(table)
-    return table
+    return ServiceStepEvent(table_id=table.id, event_type=StepEventType.SEAT, actor_user_id=actor_user_id)
 
 
-def complete_table(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
+def _apply_complete(table: ServiceTable, actor_user_id: Optional[int]) -> ServiceStepEvent:
     table.status = TableStatus.COMPLETED
     if not table.completed_at:
         table.completed_at = datetime.utcnow()
-    touch(table)
-    db.add(ServiceStepEvent(table_id=table.id, event_type=StepEventType.COMPLETE, actor_user_id=actor_user_id))
-    db.commit()
-    db.refresh(table)
-    return table
+    return ServiceStepEvent(table_id=table.id, event_type=StepEventType.COMPLETE, actor_user_id=actor_user_id)
 
 
-def next_step(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
+def _apply_next(table: ServiceTable, actor_user_id: Optional[int]) -> ServiceStepEvent:
     from_step = table.step_index
     table.step_index = from_step + 1
-    touch(table)
-    db.add(
-        ServiceStepEvent(
-            table_id=table.id,
-            event_type=StepEventType.NEXT,
-            from_step=from_step,
-            to_step=table.step_index,
-            actor_user_id=actor_user_id,
-        )
+    table.undo_depth = (table.undo_depth or 0) + 1
+    table.redo_depth = 0
+    return ServiceStepEvent(
+        table_id=table.id,
+        event_type=StepEventType.NEXT,
+        from_step=from_step,
+        to_step=table.step_index,
+        actor_user_id=actor_user_id,
     )
-    db.commit()
-    db.refresh(table)
-    return table
 
 
-def undo_step(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
-    last = (
-        db.query(ServiceStepEvent)
-        .filter(ServiceStepEvent.table_id == table.id)
-        .filter(ServiceStepEvent.event_type.in_([StepEventType.NEXT, StepEventType.UNDO]))
-        .order_by(desc(ServiceStepEvent.created_at))
-        .first()
+def _apply_undo(table: ServiceTable, actor_user_id: Optional[int]) -> Optional[ServiceStepEvent]:
+    if not table.undo_depth:
+        return None
+    from_step = table.step_index
+    table.step_index = from_step - 1
+    table.undo_depth -= 1
+    table.redo_depth = (table.redo_depth or 0) + 1
+    return ServiceStepEvent(
+        table_id=table.id,
+        event_type=StepEventType.UNDO,
+        from_step=from_step,
+        to_step=table.step_index,
+        actor_user_id=actor_user_id,
     )
-    if not last:
-        return table
 
-    if last.event_type == StepEventType.NEXT:
-        target = last.from_step if last.from_step is not None else max(table.step_index - 1, 0)
-    else:
-        target = last.to_step if last.to_step is not None else max(table.step_index - 1, 0)
 
+def _apply_redo(table: ServiceTable, actor_user_id: Optional[int]) -> Optional[ServiceStepEvent]:
+    if not table.redo_depth:
+        return None
     from_step = table.step_index
-    table.step_index = max(int(target), 0)
-    touch(table)
-
-    db.add(
-        ServiceStepEvent(
-            table_id=table.id,
-            event_type=StepEventType.UNDO,
-            from_step=from_step,
-            to_step=table.step_index,
-            actor_user_id=actor_user_id,
-            payload=json.dumps({"undid_event_id": last.id}),
-        )
+    table.step_index = from_step + 1
+    table.redo_depth -= 1
+    table.undo_depth = (table.undo_depth or 0) + 1
+    return ServiceStepEvent(
+        table_id=table.id,
+        event_type=StepEventType.REDO,
+        from_step=from_step,
+        to_step=table.step_index,
+        actor_user_id=actor_user_id,
     )
-    db.commit()
-    db.refresh(table)
-    return table
 
 
-def ensure_wines_unlocked(table: ServiceTable) -> bool:
-    return table.arrived_at is not None
+def _apply_guest_add(table: ServiceTable, guest_data: dict, actor_user_id: Optional[int]) -> ServiceStepEvent:
+    # assign the id up front so the event payload doesn't need a flush
+    g = ServiceGuest(id=str(uuid.uuid4()), **guest_data)
+    table.guests.append(g)
 
-
-def add_guest(db: Session, table: ServiceTable, guest_data: dict, actor_user_id: Optional[int]):
-    g = ServiceGuest(table_id=table.id, **guest_data)
-    db.add(g)
-    db.flush()
-    touch(table)
-
-    db.add(
-        ServiceStepEvent(
-            table_id=table.id,
-            event_type=StepEventType.GUEST_ADD,
-            actor_user_id=actor_user_id,
-            payload=json.dumps({"guest_id": g.id}),
-        )
+    return ServiceStepEvent(
+        table_id=table.id,
+        event_type=StepEventType.GUEST_ADD,
+        actor_user_id=actor_user_id,
+        payload=event_payload(
+            StepEventType.GUEST_ADD,
+            guest_id=g.id,
+            values={f: getattr(g, f) for f in GUEST_FIELDS},
+        ),
     )
-    db.commit()
-    db.refresh(table)
-    return table
 
 
-def update_guest(db: Session, table: ServiceTable, guest: ServiceGuest, guest_data: dict, actor_user_id: Optional[int]):
+def _apply_guest_update(guest: ServiceGuest, guest_data: dict, actor_user_id: Optional[int]) -> ServiceStepEvent:
     for k, v in guest_data.items():
         setattr(guest, k, v)
     guest.updated_at = datetime.utcnow()
-    touch(table)
 
-    db.add(
-        ServiceStepEvent(
-            table_id=table.id,
-            event_type=StepEventType.GUEST_UPDATE,
-            actor_user_id=actor_user_id,
-            payload=json.dumps({"guest_id": guest.id, "fields": list(guest_data.keys())}),
-        )
+    return ServiceStepEvent(
+        table_id=guest.table_id,
+        event_type=StepEventType.GUEST_UPDATE,
+        actor_user_id=actor_user_id,
+        payload=event_payload(
+            StepEventType.GUEST_UPDATE,
+            guest_id=guest.id,
+            fields=list(guest_data.keys()),
+            values=guest_data,
+        ),
     )
-    db.commit()
-    db.refresh(table)
-    return table
 
 
-def remove_guest(db: Session, table: ServiceTable, guest: ServiceGuest, actor_user_id: Optional[int]):
+def _apply_guest_remove(table: ServiceTable, guest: ServiceGuest, actor_user_id: Optional[int]) -> ServiceStepEvent:
     gid = guest.id
-    db.delete(guest)
-    touch(table)
+    # delete-orphan cascade deletes the row; the loaded collection stays in sync
+    table.guests.remove(guest)
 
-    db.add(
-        ServiceStepEvent(
-            table_id=table.id,
-            event_type=StepEventType.GUEST_REMOVE,
-            actor_user_id=actor_user_id,
-            payload=json.dumps({"guest_id": gid}),
-        )
+    return ServiceStepEvent(
+        table_id=table.id,
+        event_type=StepEventType.GUEST_REMOVE,
+        actor_user_id=actor_user_id,
+        payload=event_payload(StepEventType.GUEST_REMOVE, guest_id=gid),
     )
-    db.commit()
-    db.refresh(table)
-    return table
 
 
-def add_wine(db: Session, table: ServiceTable, wine_data: dict, actor_user_id: Optional[int]):
-    w = ServiceTableWine(table_id=table.id, **wine_data)
-    db.add(w)
-    db.flush()
-    touch(table)
+def _wine_snapshot(wine: ServiceTableWine) -> dict:
+    return {"id": wine.id, "kind": wine.kind, "wine_id": wine.wine_id, "label": wine.label, "quantity": wine.quantity}
 
-    db.add(
-        ServiceStepEvent(
-            table_id=table.id,
-            event_type=StepEventType.WINE_ADD,
-            actor_user_id=actor_user_id,
-            payload=json.dumps({"wine_entry_id": w.id}),
-        )
+
+def _apply_wine_add(table: ServiceTable, wine_data: dict, actor_user_id: Optional[int]) -> ServiceStepEvent:
+    w = ServiceTableWine(id=str(uuid.uuid4()), **{"quantity": 1.0, **wine_data})
+    table.wines.append(w)
+
+    return ServiceStepEvent(
+        table_id=table.id,
+        event_type=StepEventType.WINE_ADD,
+        actor_user_id=actor_user_id,
+        payload=event_payload(StepEventType.WINE_ADD, wine_entry_id=w.id, wine_id=w.wine_id, wine_entry=_wine_snapshot(w)),
     )
-    db.commit()
-    db.refresh(table)
-    return table
 
 
-def update_wine(db: Session, table: ServiceTable, wine: ServiceTableWine, wine_data: dict, actor_user_id: Optional[int]):
+def _apply_wine_update(wine: ServiceTableWine, wine_data: dict, actor_user_id: Optional[int]) -> ServiceStepEvent:
     for k, v in wine_data.items():
         setattr(wine, k, v)
     wine.updated_at = datetime.utcnow()
-    touch(table)
 
+    return ServiceStepEvent(
+        table_id=wine.table_id,
+        event_type=StepEventType.UPDATE,
+        actor_user_id=actor_user_id,
+        payload=event_payload(
+            StepEventType.UPDATE,
+            wine_entry_id=wine.id,
+            fields=list(wine_data.keys()),
+            values=wine_data,
+        ),
+    )
+
+
+def _apply_wine_remove(table: ServiceTable, wine: ServiceTableWine, actor_user_id: Optional[int]) -> ServiceStepEvent:
+    payload = event_payload(
+        StepEventType.WINE_REMOVE,
+        wine_entry_id=wine.id,
+        wine_id=wine.wine_id,
+        wine_entry=_wine_snapshot(wine),
+    )
+    table.wines.remove(wine)
+
+    return ServiceStepEvent(
+        table_id=table.id,
+        event_type=StepEventType.WINE_REMOVE,
+        actor_user_id=actor_user_id,
+        payload=payload,
+    )
+
+
+def stamp_events(table, events: Sequence[ServiceStepEvent]):
+    """
+    Copy the event log's partition key (company_id, service_date) from the
+    table, and give the events of one commit distinct, ordered timestamps so
+    replay applies them in the order they happened.
+    """
+    now = datetime.utcnow()
+    for i, ev in enumerate(events):
+        ev.company_id = table.company_id
+        ev.service_date = table.service_date
+        ev.created_at = now + timedelta(microseconds=i)
+
+
+def snapshot_if_due(db: Session, table: ServiceTable, events: Sequence[ServiceStepEvent]):
+    """Every SNAPSHOT_EVERY versions, store the table's state for point-in-time replay."""
+    if not events or table.version % SNAPSHOT_EVERY:
+        return
     db.add(
-        ServiceStepEvent(
+        ServiceTableSnapshot(
             table_id=table.id,
-            event_type=StepEventType.UPDATE,
-            actor_user_id=actor_user_id,
-            payload=json.dumps({"wine_entry_id": wine.id, "fields": list(wine_data.keys())}),
+            company_id=table.company_id,
+            service_date=table.service_date,
+            version=table.version,
+            taken_at=events[-1].created_at,
+            state=table_state(table),
         )
     )
-    db.commit()
-    db.refresh(table)
-    return table
 
 
-def remove_wine(db: Session, table: ServiceTable, wine: ServiceTableWine, actor_user_id: Optional[int]):
-    payload = {
-        "wine_entry": {
-            "id": wine.id,
-            "kind": str(wine.kind.value),
-            "wine_id": wine.wine_id,
-            "label": wine.label,
-            "quantity": float(wine.quantity),
-        }
-    }
-    db.delete(wine)
+def _commit(db: Session, table: ServiceTable, events: List[ServiceStepEvent]) -> ServiceTable:
     touch(table)
+    stamp_events(table, events)
+    snapshot_if_due(db, table, events)
+    journal_rows = stage_events(db, events)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise TableUseConflictError(
+            "That table_number/turn/service_date is already used for this company."
+        ) from e
+    except StaleDataError as e:
+        # the UPDATE ... WHERE version = :loaded matched no row
+        db.rollback()
+        raise StaleTableError("Table was changed by someone else") from e
 
-    db.add(
-        ServiceStepEvent(
-            table_id=table.id,
-            event_type=StepEventType.WINE_REMOVE,
-            actor_user_id=actor_user_id,
-            payload=json.dumps(payload),
-        )
+    event_journal.append(journal_rows)
+    publish_events(table, events)
+    return table
+
+
+def patch_table(db: Session, table: ServiceTable, data: dict, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_patch(table, data, actor_user_id)])
+
+
+def mark_arrived(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_arrive(table, actor_user_id)])
+
+
+def mark_seated(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_seat(table, actor_user_id)])
+
+
+def complete_table(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_complete(table, actor_user_id)])
+
+
+def next_step(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_next(table, actor_user_id)])
+
+
+def undo_step(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
+    ev = _apply_undo(table, actor_user_id)
+    if ev is None:
+        return table
+    return _commit(db, table, [ev])
+
+
+def redo_step(db: Session, table: ServiceTable, actor_user_id: Optional[int]):
+    ev = _apply_redo(table, actor_user_id)
+    if ev is None:
+        return table
+    return _commit(db, table, [ev])
+
+
+STEP_STATE_COLUMNS = (
+    ServiceTable.id,
+    ServiceTable.company_id,
+    ServiceTable.service_date,
+    ServiceTable.step_index,
+    ServiceTable.status,
+    ServiceTable.updated_at,
+    ServiceTable.version,
+    ServiceTable.undo_depth,
+    ServiceTable.redo_depth,
+)
+
+
+def _step_state(db: Session, table_id: str, company_id: Optional[int]):
+    q = db.query(*STEP_STATE_COLUMNS).filter(ServiceTable.id == table_id)
+    if company_id is not None:
+        q = q.filter(ServiceTable.company_id == company_id)
+    return q.first()
+
+
+def _atomic_step(
+    db: Session,
+    table_id: str,
+    company_id: Optional[int],
+    event_type: StepEventType,
+    actor_user_id: Optional[int],
+    expected_version: Optional[int],
+):
+    """
+    Move step_index by one inside a single UPDATE, so concurrent taps from
+    several devices each apply instead of overwriting one another:
+
+        UPDATE service_tables SET step_index = step_index +/- 1, version = version + 1,
+            undo_depth = ..., redo_depth = ...
+        WHERE id = :id [AND company_id = :c] [AND version = :expected] [AND undo_depth > 0]
+        RETURNING id, company_id, step_index, status, updated_at, version, undo_depth, redo_depth
+
+    The undo history is just the two depth counters on the row, so undo and
+    redo never look at the event log. The step event is inserted in the same
+    transaction. Returns the table's step state, or None if the table doesn't
+    exist. An undo/redo with nothing to undo/redo is a no-op and returns the
+    current state.
+    """
+    values = {"updated_at": datetime.utcnow(), "version": ServiceTable.version + 1}
+    guard = None
+    if event_type == StepEventType.NEXT:
+        delta = 1
+        values.update(undo_depth=ServiceTable.undo_depth + 1, redo_depth=0)
+    elif event_type == StepEventType.UNDO:
+        delta = -1
+        values.update(undo_depth=ServiceTable.undo_depth - 1, redo_depth=ServiceTable.redo_depth + 1)
+        guard = ServiceTable.undo_depth > 0
+    else:
+        delta = 1
+        values.update(undo_depth=ServiceTable.undo_depth + 1, redo_depth=ServiceTable.redo_depth - 1)
+        guard = ServiceTable.redo_depth > 0
+
+    stmt = (
+        update(ServiceTable)
+        .where(ServiceTable.id == table_id)
+        .values(step_index=ServiceTable.step_index + delta, **values)
+        .execution_options(synchronize_session=False)
+    )
+    if guard is not None:
+        stmt = stmt.where(guard)
+    if company_id is not None:
+        stmt = stmt.where(ServiceTable.company_id == company_id)
+    if expected_version is not None:
+        stmt = stmt.where(ServiceTable.version == expected_version)
+
+    if db.get_bind().dialect.update_returning:
+        row = db.execute(stmt.returning(*STEP_STATE_COLUMNS)).first()
+    else:
+        result = db.execute(stmt)
+        row = _step_state(db, table_id, company_id) if result.rowcount else None
+
+    if row is None:
+        # nothing updated: work out why without holding anything
+        db.rollback()
+        current = _step_state(db, table_id, company_id)
+        if current is None:
+            return None
+        if expected_version is not None and current.version != expected_version:
+            raise StaleTableError(f"Table is at version {current.version}, not {expected_version}")
+        return current
+
+    ev = ServiceStepEvent(
+        table_id=row.id,
+        event_type=event_type,
+        from_step=row.step_index - delta,
+        to_step=row.step_index,
+        actor_user_id=actor_user_id,
     )
+    stamp_events(row, [ev])
+    if row.version % SNAPSHOT_EVERY == 0:
+        # the UPDATE bypassed the session, so load the table fresh for the snapshot
+        t = (
+            db.query(ServiceTable)
+            .options(selectinload(ServiceTable.guests), selectinload(ServiceTable.wines))
+            .populate_existing()
+            .filter(ServiceTable.id == row.id)
+            .one()
+        )
+        snapshot_if_due(db, t, [ev])
+    journal_rows = stage_events(db, [ev])
     db.commit()
-    db.refresh(table)
-    return table
+    event_journal.append(journal_rows)
+    publish_events(row, [ev])
+    return row
+
+
+def advance_step(
+    db: Session,
+    table_id: str,
+    company_id: Optional[int],
+    actor_user_id: Optional[int],
+    expected_version: Optional[int] = None,
+):
+    return _atomic_step(db, table_id, company_id, StepEventType.NEXT, actor_user_id, expected_version)
+
+
+def revert_step(
+    db: Session,
+    table_id: str,
+    company_id: Optional[int],
+    actor_user_id: Optional[int],
+    expected_version: Optional[int] = None,
+):
+    return _atomic_step(db, table_id, company_id, StepEventType.UNDO, actor_user_id, expected_version)
+
+
+def reapply_step(
+    db: Session,
+    table_id: str,
+    company_id: Optional[int],
+    actor_user_id: Optional[int],
+    expected_version: Optional[int] = None,
+):
+    return _atomic_step(db, table_id, company_id, StepEventType.REDO, actor_user_id, expected_version)
+
+
+def ensure_wines_unlocked(table: ServiceTable) -> bool:
+    return table.arrived_at is not None
+
+
+def add_guest(db: Session, table: ServiceTable, guest_data: dict, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_guest_add(table, guest_data, actor_user_id)])
+
+
+def update_guest(db: Session, table: ServiceTable, guest: ServiceGuest, guest_data: dict, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_guest_update(guest, guest_data, actor_user_id)])
+
+
+def remove_guest(db: Session, table: ServiceTable, guest: ServiceGuest, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_guest_remove(table, guest, actor_user_id)])
+
+
+def add_wine(db: Session, table: ServiceTable, wine_data: dict, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_wine_add(table, wine_data, actor_user_id)])
+
+
+def update_wine(db: Session, table: ServiceTable, wine: ServiceTableWine, wine_data: dict, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_wine_update(wine, wine_data, actor_user_id)])
+
+
+def remove_wine(db: Session, table: ServiceTable, wine: ServiceTableWine, actor_user_id: Optional[int]):
+    return _commit(db, table, [_apply_wine_remove(table, wine, actor_user_id)])
+
+
+def _find(items, item_id: Optional[str], what: str, index: int):
+    found = next((i for i in items if i.id == item_id), None)
+    if found is None:
+        raise BatchTargetNotFoundError(index, f"{what} {item_id} not found")
+    return found
+
+
+def apply_batch(db: Session, table: ServiceTable, ops: List[dict], actor_user_id: Optional[int]):
+    """
+    Apply an ordered list of table operations in one transaction.
+
+    Each op is a dict with an "op" key (see TableBatchRequest). All ops are applied
+    to the in-session table, then the table is touched once and every step event
+    is inserted in a single flush. Any failing op rolls back the whole batch.
+    """
+    events: List[ServiceStepEvent] = []
+    try:
+        _apply_ops(db, table, ops, events, actor_user_id)
+    except BatchOperationError:
+        db.rollback()
+        raise
+
+    return _commit(db, table, events)
+
+
+def _apply_ops(db: Session, table: ServiceTable, ops: List[dict], events: List[ServiceStepEvent], actor_user_id):
+    for i, op in enumerate(ops):
+        kind = op["op"]
+        data = op.get("data") or {}
+
+        if kind == "next":
+            events.append(_apply_next(table, actor_user_id))
+        elif kind in ("undo", "redo"):
+            ev = (_apply_undo if kind == "undo" else _apply_redo)(table, actor_user_id)
+            if ev is not None:
+                events.append(ev)
+        elif kind == "arrive":
+            events.append(_apply_arrive(table, actor_user_id))
+        elif kind == "seat":
+            events.append(_apply_seat(table, actor_user_id))
+        elif kind == "complete":
+            events.append(_apply_complete(table, actor_user_id))
+        elif kind == "patch":
+            events.append(_apply_patch(table, data, actor_user_id))
+        elif kind == "guest_add":
+            events.append(_apply_guest_add(table, data, actor_user_id))
+        elif kind == "guest_patch":
+            g = _find(table.guests, op.get("guest_id"), "Guest", i)
+            events.append(_apply_guest_update(g, data, actor_user_id))
+        elif kind == "guest_remove":
+            g = _find(table.guests, op.get("guest_id"), "Guest", i)
+            events.append(_apply_guest_remove(table, g, actor_user_id))
+        elif kind in ("wine_add", "wine_patch", "wine_remove"):
+            if not ensure_wines_unlocked(table):
+                raise BatchWinesLockedError(i, "Wines are locked until arrival")
+            if kind == "wine_add":
+                events.append(_apply_wine_add(table, data, actor_user_id))
+            else:
+                w = _find(table.wines, op.get("wine_entry_id"), "Wine entry", i)
+                if kind == "wine_patch":
+                    events.append(_apply_wine_update(w, data, actor_user_id))
+                else:
+                    events.append(_apply_wine_remove(table, w, actor_user_id))
+        else:
+            raise BatchOperationError(i, f"Unknown op {kind!r}")
@@ -0,0 +1,67 @@
+# backend/app/crud/service_async.py
+"""
+AsyncSession versions of the app.crud.service functions used by the routes.
+
+Each function runs its sync counterpart through AsyncSession.run_sync: the
+ORM code executes in a greenlet on the event loop and every database round
+trip is awaited on the async driver (aiosqlite / asyncpg), so a request
+never occupies a threadpool worker. Signatures match app.crud.service with
+an AsyncSession in place of the Session; exceptions and the pure helpers
+(check_version, ensure_wines_unlocked, cursors) stay in app.crud.service.
+
+Returned ORM objects are detached from lazy loading: the detail loaders
+eager load guests and wines, so responses serialize from loaded state.
+"""
+import functools
+from typing import Awaitable, Callable, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import service as crud
+
+T = TypeVar("T")
+
+
+def _async(fn: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    @functools.wraps(fn)
+    async def wrapper(db: AsyncSession, *args, **kwargs) -> T:
+        return await db.run_sync(fn, *args, **kwargs)
+
+    return wrapper
+
+
+# service days
+current_service_day = _async(crud.current_service_day)
+close_out_day = _async(crud.close_out_day)
+close_out_before = _async(crud.close_out_before)
+
+# reads
+get_table = _async(crud.get_table)
+get_table_detail = _async(crud.get_table_detail)
+get_table_version = _async(crud.get_table_version)
+get_tables_max_updated_at = _async(crud.get_tables_max_updated_at)
+list_tables = _async(crud.list_tables)
+list_changes = _async(crud.list_changes)
+find_events = _async(crud.find_events)
+
+# tables
+create_table = _async(crud.create_table)
+create_tables_bulk = _async(crud.create_tables_bulk)
+patch_table = _async(crud.patch_table)
+apply_batch = _async(crud.apply_batch)
+mark_arrived = _async(crud.mark_arrived)
+mark_seated = _async(crud.mark_seated)
+complete_table = _async(crud.complete_table)
+
+# steps
+advance_step = _async(crud.advance_step)
+revert_step = _async(crud.revert_step)
+reapply_step = _async(crud.reapply_step)
+
+# guests and wines
+add_guest = _async(crud.add_guest)
+update_guest = _async(crud.update_guest)
+remove_guest = _async(crud.remove_guest)
+add_wine = _async(crud.add_wine)
+update_wine = _async(crud.update_wine)
+remove_wine = _async(crud.remove_wine)
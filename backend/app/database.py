@@ -1,4 +1,9 @@
 # backend/app/database.py
 # Re-export common DB objects to maintain backward compatibility with older imports
-from app.db import engine, SessionLocal, get_db
-from app.models.base import Base
+from app.db import Base, SessionLocal, database, get_db  # noqa: F401
+
+
+def __getattr__(name: str):
+    if name == "engine":
+        return database.engine
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
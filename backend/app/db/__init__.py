@@ -0,0 +1,161 @@
+# backend/app/db/__init__.py
+"""
+The process's one database registry.
+
+`database` holds every engine and session factory the app uses, built once
+from Settings: the sync engine (scripts, background jobs, sync routes), the
+async engine (async routes) and, under the SQLite production profile, the
+single writer (see app.core.sqlite). Everything imports from here;
+app.database and app.db.session only re-export it.
+
+SessionLocal and AsyncSessionLocal are stable objects, so code holding on to
+them follows database.configure(), which tests use to point the registry at
+their own database.
+"""
+from typing import Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+from app.core.config import settings
+from app.core.db_pool import pool_options
+from app.core.sqlite import SQLiteWriter, apply_pragmas, begin_immediate, production_profile
+
+Base = declarative_base()
+
+# async drivers for the same databases DATABASE_URL points at
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """sqlite:///./app.db -> sqlite+aiosqlite:///./app.db, postgresql+psycopg2://... -> postgresql+asyncpg://..."""
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} databases")
+    return u.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def connect_args_for(url: str) -> dict:
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+
+class Database:
+    def __init__(self):
+        # Sessions are request-scoped, so keep committed state in memory instead of
+        # expiring it; responses are built from the session without a reload round trip.
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
+        # Same semantics for async routes. Async sessions can't lazy load, so
+        # routes must eager load whatever the response serializes.
+        self.AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+        # Sync sessions for writers outside a request (journal flusher, rollover,
+        # scripts). Under the SQLite production profile they share the writer's
+        # one connection, so they queue behind it instead of racing it for the lock.
+        self.WriteSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
+
+        self.url: Optional[str] = None
+        self.async_url: Optional[str] = None
+        self.sqlite_production = False
+        self.engine: Optional[Engine] = None
+        self.async_engine: Optional[AsyncEngine] = None
+        self.write_engine: Optional[Engine] = None
+        self.sqlite_writer: Optional[SQLiteWriter] = None
+
+    def configure(
+        self,
+        url: Optional[str] = None,
+        async_url: Optional[str] = None,
+        sqlite_profile: Optional[str] = None,
+        async_poolclass=None,
+    ) -> "Database":
+        """(Re)build every engine; defaults come from Settings. Old engines are disposed."""
+        self.dispose()
+        url = url or settings.DATABASE_URL
+        async_url = async_url or (settings.ASYNC_DATABASE_URL if url == settings.DATABASE_URL else None)
+        async_url = async_url or async_database_url(url)
+        connect_args = connect_args_for(url)
+
+        # WAL, pragmas and a single writer for file-backed SQLite, see app.core.sqlite
+        self.sqlite_production = production_profile(url, sqlite_profile)
+
+        self.engine = create_engine(url, connect_args=connect_args, **pool_options(url))
+        async_options = (
+            {"poolclass": async_poolclass} if async_poolclass else pool_options(async_url, is_async=True)
+        )
+        self.async_engine = create_async_engine(async_url, **async_options)
+        self.write_engine = None
+        self.sqlite_writer = None
+
+        if self.sqlite_production:
+            apply_pragmas(self.engine)
+            apply_pragmas(self.async_engine.sync_engine)
+            # the single writer: one connection, owned by the writer thread
+            self.write_engine = create_engine(
+                url,
+                connect_args=connect_args,
+                **pool_options(url, size=1, max_overflow=0),
+            )
+            apply_pragmas(self.write_engine)
+            begin_immediate(self.write_engine)
+            self.sqlite_writer = SQLiteWriter(self.WriteSessionLocal)
+
+        self.url, self.async_url = url, async_url
+        self.SessionLocal.configure(bind=self.engine)
+        self.AsyncSessionLocal.configure(bind=self.async_engine)
+        self.WriteSessionLocal.configure(bind=self.write_engine or self.engine)
+        return self
+
+    def dispose(self):
+        """Close sync pools and the writer. Async pools need `await aclose()`."""
+        if self.sqlite_writer is not None:
+            self.sqlite_writer.stop()
+        for e in (self.engine, self.write_engine):
+            if e is not None:
+                e.dispose()
+
+    async def aclose(self):
+        """Shutdown: aiosqlite connections run on non-daemon threads; close them so the process can exit."""
+        self.dispose()
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+
+
+database = Database().configure()
+SessionLocal = database.SessionLocal
+AsyncSessionLocal = database.AsyncSessionLocal
+WriteSessionLocal = database.WriteSessionLocal
+
+
+def __getattr__(name: str):
+    # `from app.db import engine` etc. resolve against the current configuration
+    if name in ("engine", "async_engine", "write_engine", "sqlite_writer"):
+        return getattr(database, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_write_db():
+    """For routes that write: the SQLite writer's session under the production profile, else an AsyncSession."""
+    if database.sqlite_writer is None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    db = database.sqlite_writer.session()
+    try:
+        yield db
+    finally:
+        await db.close()
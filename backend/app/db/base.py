@@ -1,3 +1,3 @@
-from sqlalchemy.orm import declarative_base
-
-Base = declarative_base()
+# backend/app/db/base.py
+# Re-exports the one declarative Base from the app.db registry.
+from app.db import Base  # noqa: F401
@@ -1,23 +1,3 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-# SQLite now; Postgres later: set DATABASE_URL=postgresql+psycopg://...
-DATABASE_URL = "sqlite:///./app.db"
-
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-
-engine = create_engine(
-    DATABASE_URL,
-    connect_args=connect_args,
-    pool_pre_ping=True,
-)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# backend/app/db/session.py
+# Re-exports the app.db registry; kept so older `app.db.session` imports share its engine.
+from app.db import SessionLocal, get_db  # noqa: F401
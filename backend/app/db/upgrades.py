@@ -0,0 +1,146 @@
+# backend/app/db/upgrades.py
+"""
+In-place upgrades for databases created before a column existed.
+
+Tables come from Base.metadata.create_all(), which never alters a table that
+already exists. Each upgrade here adds what's missing and backfills it, and
+is a no-op on an up-to-date database. init_db runs them all after
+create_all; tools/migrate_add_undo_depth.py runs add_undo_redo_depth on its own.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+
+# every table on Base.metadata, for add_missing_indexes
+import app.models  # noqa: F401
+import app.models.service  # noqa: F401
+from app.db import Base
+
+
+def add_undo_redo_depth(engine: Engine) -> int:
+    """
+    Add service_tables.undo_depth/redo_depth. Tables already in progress get
+    undo_depth = step_index: every step they reached is one undoable NEXT.
+    Returns the number of tables backfilled.
+    """
+    insp = inspect(engine)
+    if not insp.has_table("service_tables"):
+        return 0
+    cols = {c["name"] for c in insp.get_columns("service_tables")}
+    if "undo_depth" in cols and "redo_depth" in cols:
+        return 0
+    with engine.begin() as conn:
+        if "undo_depth" not in cols:
+            conn.execute(text("ALTER TABLE service_tables ADD COLUMN undo_depth INTEGER NOT NULL DEFAULT 0"))
+        if "redo_depth" not in cols:
+            conn.execute(text("ALTER TABLE service_tables ADD COLUMN redo_depth INTEGER NOT NULL DEFAULT 0"))
+        if "undo_depth" in cols:
+            return 0
+        return conn.execute(text("UPDATE service_tables SET undo_depth = step_index WHERE step_index > 0")).rowcount
+
+
+def add_table_version(engine: Engine) -> bool:
+    """
+    Add service_tables.version, the optimistic-concurrency counter. Existing
+    tables start at 1, same as new ones. Returns whether the column was added.
+    """
+    insp = inspect(engine)
+    if not insp.has_table("service_tables"):
+        return False
+    if "version" in {c["name"] for c in insp.get_columns("service_tables")}:
+        return False
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE service_tables ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+    return True
+
+
+def add_company_service_day(engine: Engine) -> bool:
+    """
+    Add companies.timezone and service_day_cutoff_hour with the model's
+    defaults. Returns whether anything was added.
+    """
+    insp = inspect(engine)
+    if not insp.has_table("companies"):
+        return False
+    cols = {c["name"] for c in insp.get_columns("companies")}
+    if "timezone" in cols and "service_day_cutoff_hour" in cols:
+        return False
+    with engine.begin() as conn:
+        if "timezone" not in cols:
+            conn.execute(text("ALTER TABLE companies ADD COLUMN timezone VARCHAR NOT NULL DEFAULT 'UTC'"))
+        if "service_day_cutoff_hour" not in cols:
+            conn.execute(text("ALTER TABLE companies ADD COLUMN service_day_cutoff_hour INTEGER NOT NULL DEFAULT 4"))
+    return True
+
+
+def scope_step_events(engine: Engine) -> int:
+    """
+    Bring service_step_events up to the day-scoped log: add company_id and
+    service_date, copied from each event's table, and drop what tied events
+    to service_tables. On PostgreSQL that's the table_id FK (SQLite never
+    enforced it, foreign_keys is off) and the TEXT payload, which becomes
+    JSONB; SQLite stores JSON as text already. Returns the number of events
+    backfilled.
+    """
+    insp = inspect(engine)
+    if not insp.has_table("service_step_events"):
+        return 0
+    cols = {c["name"]: c for c in insp.get_columns("service_step_events")}
+    postgres = engine.dialect.name == "postgresql"
+    fks = [fk["name"] for fk in insp.get_foreign_keys("service_step_events") if fk.get("name")]
+    with engine.begin() as conn:
+        if postgres:
+            for name in fks:
+                conn.execute(text(f'ALTER TABLE service_step_events DROP CONSTRAINT "{name}"'))
+            if "payload" in cols and not isinstance(cols["payload"]["type"], JSONB):
+                conn.execute(text(
+                    "ALTER TABLE service_step_events ALTER COLUMN payload TYPE JSONB USING payload::jsonb"
+                ))
+        if "company_id" in cols and "service_date" in cols:
+            return 0
+        if "company_id" not in cols:
+            conn.execute(text("ALTER TABLE service_step_events ADD COLUMN company_id INTEGER"))
+        if "service_date" not in cols:
+            conn.execute(text("ALTER TABLE service_step_events ADD COLUMN service_date DATE"))
+        count = conn.execute(text(
+            "UPDATE service_step_events SET "
+            "company_id = (SELECT t.company_id FROM service_tables t WHERE t.id = service_step_events.table_id), "
+            "service_date = (SELECT t.service_date FROM service_tables t WHERE t.id = service_step_events.table_id) "
+            "WHERE company_id IS NULL OR service_date IS NULL"
+        )).rowcount
+        if postgres:
+            # the FK kept every event's table around, so nothing is left NULL
+            conn.execute(text(
+                "ALTER TABLE service_step_events "
+                "ALTER COLUMN company_id SET NOT NULL, ALTER COLUMN service_date SET NOT NULL"
+            ))
+        return count
+
+
+def add_missing_indexes(engine: Engine):
+    """
+    Create the model indexes an existing table doesn't have yet; create_all
+    only builds indexes together with a new table. IF NOT EXISTS rather than
+    reflection, which can't see expression indexes such as the payload ones.
+    """
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if insp.has_table(table.name):
+                for index in table.indexes:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+UPGRADES = (
+    add_undo_redo_depth,
+    add_table_version,
+    add_company_service_day,
+    scope_step_events,
+    add_missing_indexes,
+)
+
+
+def upgrade(engine: Engine):
+    for fn in UPGRADES:
+        fn(engine)
@@ -1,12 +1,3 @@
 # backend/app/dependencies.py
 
-from typing import Generator
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
-
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from app.db import get_db  # noqa: F401
@@ -1,8 +1,14 @@
 # backend/app/main.py
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
+from app.db import WriteSessionLocal, database
+from app.services.event_journal import event_journal
+from app.services.service_rollover import rollover_loop
 
 from app.routes.auth import router as auth_router
 from app.routes.wines import router as wines_router
@@ -10,8 +16,32 @@ from app.routes.tables import router as tables_router
 from app.routes.guests import router as guests_router
 from app.routes.orders import router as orders_router
 from app.routes.service import router as service_router
+from app.routes.inventory import router as inventory_router
+from app.routes.company import router as company_router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.EVENT_JOURNAL_MODE == "write_behind":
+        event_journal.start(
+            WriteSessionLocal,
+            settings.EVENT_JOURNAL_SPOOL,
+            queue_size=settings.EVENT_JOURNAL_QUEUE_SIZE,
+            batch_size=settings.EVENT_JOURNAL_BATCH_SIZE,
+            flush_interval=settings.EVENT_JOURNAL_FLUSH_SECONDS,
+        )
+    rollover = None
+    if settings.SERVICE_ROLLOVER_SECONDS > 0:
+        rollover = asyncio.create_task(rollover_loop(WriteSessionLocal, settings.SERVICE_ROLLOVER_SECONDS))
+    yield
+    if rollover is not None:
+        rollover.cancel()
+        with suppress(asyncio.CancelledError):
+            await rollover
+    event_journal.stop()
+    await database.aclose()
+
 
-app = FastAPI(title="WineServiceApp API")
+app = FastAPI(title="WineServiceApp API", lifespan=lifespan)
 
 # CORS
 origins = settings.cors_origins_list()
@@ -31,3 +61,5 @@ app.include_router(tables_router, prefix="/api")
 app.include_router(guests_router, prefix="/api")
 app.include_router(orders_router, prefix="/api")
 app.include_router(service_router, prefix="/api")
+app.include_router(inventory_router, prefix="/api")
+app.include_router(company_router, prefix="/api")
@@ -13,6 +13,11 @@ class Company(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, unique=True, index=True)
 
+    # A service day runs from service_day_cutoff_hour local time to the same
+    # hour the next day, so a table seated at 00:30 still belongs to "tonight".
+    timezone = Column(String, nullable=False, default="UTC", server_default="UTC")
+    service_day_cutoff_hour = Column(Integer, nullable=False, default=4, server_default="4")
+
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(
         DateTime(timezone=True),
@@ -28,6 +33,8 @@ class Company(Base):
         cascade="all, delete-orphan",
     )
 
+    users = relationship("User", back_populates="company")
+    inventory_items = relationship("InventoryItem", back_populates="company", cascade="all, delete-orphan")
+
     # If you have other relationships, keep them BELOW and make sure their FKs exist:
-    # inventory_items = relationship("InventoryItem", back_populates="company", cascade="all, delete-orphan")
     # wines = relationship("Wine", back_populates="company", cascade="all, delete-orphan")
@@ -4,6 +4,7 @@ import uuid
 from datetime import datetime, date
 
 from sqlalchemy import (
+    JSON,
     Column,
     String,
     Integer,
@@ -13,7 +14,10 @@ from sqlalchemy import (
     Float,
     UniqueConstraint,
     ForeignKey,
+    Index,
+    bindparam,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
 from app.db import Base
@@ -36,6 +40,7 @@ class WineKind(str, enum.Enum):
 class StepEventType(str, enum.Enum):
     NEXT = "next"
     UNDO = "undo"
+    REDO = "redo"
     ARRIVE = "arrive"
     SEAT = "seat"
     COMPLETE = "complete"
@@ -73,6 +78,10 @@ class ServiceTable(Base):
     completed_at = Column(DateTime, nullable=True)
 
     step_index = Column(Integer, nullable=False, default=0)
+    # undo history as a pair of counters: every NEXT is undoable one step at
+    # a time, every UNDO redoable until the next NEXT clears the redo side
+    undo_depth = Column(Integer, nullable=False, default=0)
+    redo_depth = Column(Integer, nullable=False, default=0)
     guest_count = Column(Integer, nullable=False, default=0)
 
     notes = Column(Text, nullable=True)
@@ -80,11 +89,20 @@ class ServiceTable(Base):
     created_at = Column(DateTime, nullable=False, default=utcnow)
     updated_at = Column(DateTime, nullable=False, default=utcnow)
 
+    # optimistic concurrency: bumped by crud.touch(); every UPDATE is
+    # conditional on the version that was loaded
+    version = Column(Integer, nullable=False, default=1)
+
     # relationships
     company = relationship("Company", back_populates="service_tables")
     guests = relationship("ServiceGuest", back_populates="table", cascade="all, delete-orphan")
     wines = relationship("ServiceTableWine", back_populates="table", cascade="all, delete-orphan")
-    step_events = relationship("ServiceStepEvent", back_populates="table", cascade="all, delete-orphan")
+    # the event log outlives its tables (see ServiceStepEvent), so this is read-only
+    step_events = relationship(
+        "ServiceStepEvent",
+        primaryjoin="ServiceTable.id == foreign(ServiceStepEvent.table_id)",
+        viewonly=True,
+    )
 
     __table_args__ = (
         UniqueConstraint(
@@ -94,8 +112,22 @@ class ServiceTable(Base):
             "turn",
             name="uq_table_use_per_day",
         ),
+        # floor queries: one company's day + status, keyset on (updated_at, id)
+        Index(
+            "ix_service_tables_company_day_status_updated",
+            "company_id",
+            "service_date",
+            "status",
+            "updated_at",
+            "id",
+        ),
     )
 
+    __mapper_args__ = {
+        "version_id_col": version,
+        "version_id_generator": False,
+    }
+
 
 class ServiceGuest(Base):
     __tablename__ = "service_guests"
@@ -111,7 +143,7 @@ class ServiceGuest(Base):
     notes = Column(Text, nullable=True)
 
     created_at = Column(DateTime, nullable=False, default=utcnow)
-    updated_at = Column(DateTime, nullable=False, default=utcnow)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, index=True)
 
     table = relationship("ServiceTable", back_populates="guests")
 
@@ -128,26 +160,83 @@ class ServiceTableWine(Base):
     quantity = Column(Float, nullable=False, default=1.0)
 
     created_at = Column(DateTime, nullable=False, default=utcnow)
-    updated_at = Column(DateTime, nullable=False, default=utcnow)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, index=True)
 
     table = relationship("ServiceTable", back_populates="wines")
 
 
 class ServiceStepEvent(Base):
+    """
+    Append-only log of service changes, organised by (company_id, service_date).
+    Both are copied from the table when the event is written, and there is no
+    FK to service_tables: closed days get moved out to per-day archive files
+    (app.services.event_archive) independently of the tables they describe.
+    """
+
     __tablename__ = "service_step_events"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    table_id = Column(String, ForeignKey("service_tables.id", ondelete="CASCADE"), nullable=False, index=True)
+    table_id = Column(String, nullable=False, index=True)
+    company_id = Column(Integer, nullable=False)
+    service_date = Column(Date, nullable=False)
 
     event_type = Column(String, nullable=False)  # StepEventType value
     from_step = Column(Integer, nullable=True)
     to_step = Column(Integer, nullable=True)
 
-    payload = Column(Text, nullable=True)
+    # shape per event_type: app.schemas.service.EVENT_PAYLOADS
+    payload = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"), nullable=True)
 
     # optional actor
     actor_user_id = Column(Integer, nullable=True)
 
     created_at = Column(DateTime, nullable=False, default=utcnow)
 
-    table = relationship("ServiceTable", back_populates="step_events")
+    table = relationship(
+        "ServiceTable",
+        primaryjoin="foreign(ServiceStepEvent.table_id) == ServiceTable.id",
+        viewonly=True,
+    )
+
+    __table_args__ = (
+        # archival and per-day reads
+        Index("ix_service_step_events_company_day", "company_id", "service_date", "created_at"),
+        # change feed: guest/wine removals since a cursor
+        Index("ix_service_step_events_type_created", "event_type", "created_at"),
+        # audit lookups by guest / wine entry; query through payload_key() so the expression matches
+        Index("ix_service_step_events_guest_id", payload["guest_id"].as_string()),
+        Index("ix_service_step_events_wine_entry_id", payload["wine_entry_id"].as_string()),
+    )
+
+
+def payload_key(key: str):
+    """
+    ServiceStepEvent.payload[key] as text. The key is rendered inline instead
+    of as a bound parameter so SQLite can match the expression indexes above.
+    """
+    return ServiceStepEvent.payload[
+        bindparam(None, key, type_=JSON.JSONIndexType(), literal_execute=True)
+    ].as_string()
+
+
+class ServiceTableSnapshot(Base):
+    """
+    Full state of a table right after its event at `taken_at`, written every
+    SNAPSHOT_EVERY versions so point-in-time replay (app.services.table_replay)
+    starts from the nearest snapshot instead of the table's first event.
+    """
+
+    __tablename__ = "service_table_snapshots"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    table_id = Column(String, nullable=False)
+    company_id = Column(Integer, nullable=False)
+    service_date = Column(Date, nullable=False)
+    version = Column(Integer, nullable=False)
+    taken_at = Column(DateTime, nullable=False)
+    state = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_service_table_snapshots_table_taken", "table_id", "taken_at"),
+        Index("ix_service_table_snapshots_company_day", "company_id", "service_date"),
+    )
@@ -1,10 +1,14 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.models.user import User
 from app.auth import verify_password, create_access_token, decode_token, get_password_hash
-from app.db import get_db
+from app.core.principals import Principal, principal_cache, principal_claims
+from app.db import get_async_db, get_db
 from app.schemas.schemas import TokenResponse, UserCreate, UserOut
 
 router = APIRouter(tags=["Auth"])
@@ -14,18 +18,46 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login/")
 # Helpers
 # -------------------------------
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    data = decode_token(token)
+def token_claims(token: Optional[str]) -> dict:
+    data = decode_token(token) if token else None
     if not data:
         raise HTTPException(status_code=401, detail="Invalid token")
-    user = db.query(User).filter(User.username == data["sub"]).first()
+    return data
+
+
+def cached_principal(claims: dict) -> Optional[Principal]:
+    """The principal for `claims` without touching the database, or None."""
+    sub, iat = claims["sub"], claims.get("iat")
+    principal = principal_cache.get(sub, iat)
+    if principal is None and principal_cache.trusts_claims(sub, iat):
+        principal = Principal.from_claims(claims)
+        if principal is not None:
+            # not past the claims' own trust window, after which users is read again
+            principal_cache.put(sub, iat, principal, principal_cache.claims_ttl(iat))
+    return principal
+
+
+def load_principal(db: Session, claims: dict) -> Principal:
+    user = db.query(User).filter(User.username == claims["sub"]).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(claims["sub"], claims.get("iat"), principal)
+    return principal
+
+
+async def principal_from_token(db: AsyncSession, token: Optional[str]) -> Principal:
+    claims = token_claims(token)
+    return cached_principal(claims) or await db.run_sync(load_principal, claims)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    # the session only opens a connection on a cache miss
+    return await principal_from_token(db, token)
 
 
 def require_role(*roles):
-    def checker(current_user: User = Depends(get_current_user)):
+    def checker(current_user: Principal = Depends(get_current_user)):
         if current_user.role not in roles:
             raise HTTPException(status_code=403, detail="Not authorized")
         return current_user
@@ -42,12 +74,12 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     user = db.query(User).filter(User.username == form_data.username).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    token = create_access_token({"sub": user.username})
+    token = create_access_token(principal_claims(user))
     return {"access_token": token, "token_type": "bearer"}
 
 
 @router.get("/me", response_model=UserOut)
-def read_users_me(current_user: User = Depends(get_current_user)):
+def read_users_me(current_user: Principal = Depends(get_current_user)):
     return current_user
 
 
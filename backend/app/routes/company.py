@@ -2,26 +2,59 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from app.core.principals import Principal
+from app.crud import service as service_crud
 from app.models.company import Company
-from app.schemas.company import CompanyCreate, CompanyOut
-from app.database import get_db
+from app.schemas.company import CompanyCreate, CompanyOut, CompanyUpdate
+from app.db import get_db
+from app.routes.auth import get_current_user, require_role
 
 router = APIRouter(prefix="/companies", tags=["Companies"])
 
-@router.post("/", response_model=CompanyOut)
+
+def own_company(company_id: int, current_user: Principal):
+    if current_user.company_id != company_id:
+        raise HTTPException(status_code=404, detail="Company not found")
+
+
+@router.post("/", response_model=CompanyOut, dependencies=[Depends(require_role("owner"))])
 def create_company(company: CompanyCreate, db: Session = Depends(get_db)):
     existing = db.query(Company).filter(Company.name == company.name).first()
     if existing:
         raise HTTPException(status_code=400, detail="Company already exists")
-    new_company = Company(name=company.name)
+    new_company = Company(**company.model_dump())
     db.add(new_company)
     db.commit()
     db.refresh(new_company)
     return new_company
 
 @router.get("/{company_id}", response_model=CompanyOut)
-def get_company(company_id: int, db: Session = Depends(get_db)):
+def get_company(company_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    own_company(company_id, current_user)
+    company = db.query(Company).get(company_id)
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    return company
+
+@router.patch("/{company_id}", response_model=CompanyOut)
+def update_company(
+    company_id: int,
+    data: CompanyUpdate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role("manager", "owner")),
+):
+    own_company(company_id, current_user)
     company = db.query(Company).get(company_id)
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
+    changes = {k: v for k, v in data.model_dump(exclude_unset=True).items() if v is not None}
+    if "name" in changes and changes["name"] != company.name:
+        if db.query(Company).filter(Company.name == changes["name"]).first():
+            raise HTTPException(status_code=400, detail="Company already exists")
+    for key, value in changes.items():
+        setattr(company, key, value)
+    db.commit()
+    db.refresh(company)
+    # new tables and floor queries pick up the new day boundary right away
+    service_crud.forget_service_day(company_id)
     return company
@@ -1,50 +1,62 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
+from app.db import get_async_db, get_async_write_db
 from app.schemas.inventory import InventoryCreate, InventoryUpdate, InventoryOut
-from app.services import inventory_service
-from app.models.user import User
+from app.services.inventory_service import InventoryService
+from app.core.principals import Principal
 
 # import your existing helper from auth routes
 from app.routes.auth import get_current_user  # adjust path if yours is different
 
 router = APIRouter(prefix="/inventory", tags=["Inventory"])
 
-@router.get("/", response_model=list[InventoryOut])
-def read_inventory(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
+
+def get_inventory_service(db: AsyncSession = Depends(get_async_db)) -> InventoryService:
+    return InventoryService(db)
+
+
+def get_inventory_write_service(db: AsyncSession = Depends(get_async_write_db)) -> InventoryService:
+    # goes through the single SQLite writer under the production profile
+    return InventoryService(db)
+
+
+def require_company_id(current_user: Principal) -> int:
     if not current_user.company_id:
         raise HTTPException(status_code=400, detail="User has no company assigned")
-    return inventory_service.get_inventory_items(db, current_user.company_id)
+    return int(current_user.company_id)
+
+
+@router.get("/", response_model=list[InventoryOut])
+async def read_inventory(
+    service: InventoryService = Depends(get_inventory_service),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await service.get_all_items(require_company_id(current_user))
 
 @router.post("/", response_model=InventoryOut)
-def create_item(
+async def create_item(
     item: InventoryCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    service: InventoryService = Depends(get_inventory_write_service),
+    current_user: Principal = Depends(get_current_user),
 ):
-    if not current_user.company_id:
-        raise HTTPException(status_code=400, detail="User has no company assigned")
-    return inventory_service.create_inventory_item(db, item, current_user.company_id)
+    return await service.create_item(item, require_company_id(current_user))
 
 @router.put("/{item_id}", response_model=InventoryOut)
-def update_item(
+async def update_item(
     item_id: int,
     item: InventoryUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    service: InventoryService = Depends(get_inventory_write_service),
+    current_user: Principal = Depends(get_current_user),
 ):
-    # optional: you can enforce item belongs to user's company inside service
-    return inventory_service.update_inventory_item(db, item_id, item)
+    # scoped to the user's company: items of other companies are a 404
+    return await service.update_item(item_id, item, require_company_id(current_user))
 
 @router.delete("/{item_id}")
-def delete_item(
+async def delete_item(
     item_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    service: InventoryService = Depends(get_inventory_write_service),
+    current_user: Principal = Depends(get_current_user),
 ):
-    inventory_service.delete_inventory_item(db, item_id)
+    await service.delete_item(item_id, require_company_id(current_user))
     return {"ok": True}
@@ -1,27 +1,48 @@
 # backend/app/routes/service.py
-from datetime import datetime
-from typing import Optional
-
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-
-from app.db import get_db
-from app.routes.auth import get_current_user, require_role
-from app.models.user import User
-from app.models.service import ServiceGuest, ServiceTableWine, TableStatus
+import asyncio
+import hashlib
+import json
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db_pool import pool_stats
+from app.core.principals import Principal, principal_cache
+from app.core.token_cache import verified_tokens
+from app.db import database, get_async_db, get_async_write_db
+from app.routes.auth import get_current_user, principal_from_token, require_role
+from app.models.service import StepEventType, TableStatus
 from app.schemas.service import (
     TableCreate,
     TablePatch,
     TableDetail,
     TableListResponse,
     TableListItem,
+    TableBulkCreate,
+    TableBulkCreateResponse,
     StepAdvanceResponse,
     GuestCreate,
+    GuestOut,
     GuestPatch,
     WineEntryCreate,
+    WineEntryOut,
     WineEntryPatch,
+    TableBatchRequest,
+    ServiceChangesResponse,
+    StepEventOut,
+    TableStateAt,
+    CloseOutResponse,
 )
 from app.crud import service as crud
+from app.crud import service_async as crud_async
+from app.services import event_archive
+from app.services.event_journal import event_journal
+from app.services.floor_stream import floor_stream
+from app.services.table_replay import replay_table
 
 router = APIRouter(tags=["Service"])
 
@@ -32,8 +53,25 @@ CAN_STEPS = ("expo", "sommelier", "manager")
 CAN_WINES = ("sommelier", "manager")
 CAN_GUESTS = ("server", "expo", "sommelier", "manager")
 
-
-def require_company_id(current_user: User) -> int:
+# Batch ops are checked against the same policy as their single-op routes
+BATCH_OP_ROLES = {
+    "next": CAN_STEPS,
+    "undo": CAN_STEPS,
+    "redo": CAN_STEPS,
+    "arrive": CAN_TABLE_EDIT,
+    "seat": CAN_TABLE_EDIT,
+    "complete": CAN_TABLE_EDIT,
+    "patch": CAN_TABLE_EDIT,
+    "guest_add": CAN_GUESTS,
+    "guest_patch": CAN_GUESTS,
+    "guest_remove": CAN_GUESTS,
+    "wine_add": CAN_WINES,
+    "wine_patch": CAN_WINES,
+    "wine_remove": CAN_WINES,
+}
+
+
+def require_company_id(current_user: Principal) -> int:
     """
     ✅ Best option: service data must always be tied to a company.
     Users without company_id can't use service endpoints.
@@ -52,54 +90,436 @@ def parse_iso_dt(updated_since: Optional[str]) -> Optional[datetime]:
         raise HTTPException(status_code=400, detail="updated_since must be ISO datetime")
 
 
+async def get_table_or_404(db: AsyncSession, table_id: str, company_id: int):
+    # Detail-returning routes load guests + wines up front so the response
+    # serializes from the identity map instead of lazy loading.
+    t = await crud_async.get_table_detail(db, table_id, company_id=company_id)
+    if not t:
+        raise HTTPException(status_code=404, detail="Table not found")
+    return t
+
+
+def make_etag(*parts) -> str:
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:24] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def table_etag(version: int) -> str:
+    # strong per-URL ETag; also what mutation routes accept in If-Match
+    return f'"v{version}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    if not if_match or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"').lstrip("v")
+    if not tag.isdigit():
+        raise HTTPException(status_code=400, detail='If-Match must be a table ETag like "v3"')
+    return int(tag)
+
+
+@contextmanager
+def precondition_guard():
+    """Turn stale-version failures (If-Match mismatch or a lost race on the conditional UPDATE) into 412."""
+    try:
+        yield
+    except crud.StaleTableError as e:
+        raise HTTPException(status_code=412, detail=str(e))
+
+
+def check_if_match(table, if_match: Optional[str]):
+    with precondition_guard():
+        crud.check_version(table, parse_if_match(if_match))
+
+
+def step_response(t) -> StepAdvanceResponse:
+    """`t` is a ServiceTable or a crud step-state row."""
+    return StepAdvanceResponse(
+        table_id=t.id,
+        step_index=t.step_index,
+        updated_at=t.updated_at,
+        version=t.version,
+        undo_depth=t.undo_depth,
+        redo_depth=t.redo_depth,
+    )
+
+
+def find_by_id(items, item_id: str):
+    return next((i for i in items if i.id == item_id), None)
+
+
 @router.get(
     "/service/tables",
     response_model=TableListResponse,
     dependencies=[Depends(require_role(*CAN_VIEW))],
 )
-def list_tables(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def list_tables(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
     status: TableStatus = Query(TableStatus.OPEN),
     page: int = Query(1, ge=1),
     limit: int = Query(25, ge=1, le=100),
     updated_since: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(True),
+    service_date: Optional[date] = Query(None),
+    if_none_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
     dt = parse_iso_dt(updated_since)
+    service_date = service_date or await crud_async.current_service_day(db, company_id)
 
-    total, items = crud.list_tables(
-        db,
-        company_id=company_id,
-        status=status,
-        page=page,
-        limit=limit,
-        updated_since=dt,
+    # any change to any of the day's tables invalidates every filtered list
+    max_updated_at = await crud_async.get_tables_max_updated_at(db, company_id, service_date=service_date)
+    etag = make_etag(
+        "tables", company_id, service_date, max_updated_at,
+        TableStatus(status).value, page, limit, updated_since, cursor, include_total,
     )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    try:
+        total, items, next_cursor = await crud_async.list_tables(
+            db,
+            company_id=company_id,
+            status=status,
+            page=page,
+            limit=limit,
+            updated_since=dt,
+            cursor=cursor,
+            include_total=include_total,
+            service_date=service_date,
+        )
+    except crud.InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return TableListResponse(
         items=[TableListItem.model_validate(t) for t in items],
         page=page,
         limit=limit,
         total=total,
+        next_cursor=next_cursor,
+    )
+
+
+@router.get(
+    "/service/changes",
+    response_model=ServiceChangesResponse,
+    dependencies=[Depends(require_role(*CAN_VIEW))],
+)
+async def list_changes(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+    cursor: Optional[str] = Query(None),
+    service_date: Optional[date] = Query(None),
+):
+    """
+    Delta sync for the service floor. Call without a cursor for a snapshot of
+    the open floor, then keep passing back `next_cursor` to receive only the
+    tables, guests and wines changed since, plus removed guest/wine ids.
+    Scoped to one service day (default: the company's current one).
+    """
+    company_id = require_company_id(current_user)
+    service_date = service_date or await crud_async.current_service_day(db, company_id)
+
+    try:
+        since = crud.decode_sync_cursor(cursor) if cursor else None
+    except crud.InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    changes = await crud_async.list_changes(db, company_id=company_id, since=since, service_date=service_date)
+
+    return ServiceChangesResponse(
+        tables=[TableListItem.model_validate(t) for t in changes["tables"]],
+        guests=[GuestOut.model_validate(g) for g in changes["guests"]],
+        wines=[WineEntryOut.model_validate(w) for w in changes["wines"]],
+        deleted_guests=changes["deleted_guests"],
+        deleted_wines=changes["deleted_wines"],
+        next_cursor=crud.encode_sync_cursor(changes["as_of"]),
+    )
+
+
+@router.get(
+    "/service/events",
+    response_model=List[StepEventOut],
+    dependencies=[Depends(require_role(*CAN_VIEW))],
+)
+async def list_events(
+    service_date: date = Query(...),
+    table_id: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Event log of one service day, whether it is still live or already archived."""
+    company_id = require_company_id(current_user)
+    return await db.run_sync(event_archive.read_day, company_id, service_date, table_id=table_id)
+
+
+@router.get(
+    "/service/events/search",
+    response_model=List[StepEventOut],
+    dependencies=[Depends(require_role(*CAN_VIEW))],
+)
+async def search_events(
+    event_type: Optional[StepEventType] = Query(None),
+    table_id: Optional[str] = Query(None),
+    guest_id: Optional[str] = Query(None),
+    wine_entry_id: Optional[str] = Query(None),
+    wine_id: Optional[str] = Query(None),
+    limit: int = Query(200, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Audit search over days not archived yet, e.g. every wine_add for one wine_id."""
+    company_id = require_company_id(current_user)
+    return await crud_async.find_events(
+        db,
+        company_id,
+        event_type=event_type,
+        table_id=table_id,
+        guest_id=guest_id,
+        wine_entry_id=wine_entry_id,
+        wine_id=wine_id,
+        limit=limit,
+    )
+
+
+@router.get(
+    "/service/journal/stats",
+    dependencies=[Depends(require_role("manager"))],
+)
+async def journal_stats():
+    """Write-behind event journal: queue depth, flush latency, failures."""
+    return event_journal.stats()
+
+
+@router.get(
+    "/service/auth/cache",
+    dependencies=[Depends(require_role("manager"))],
+)
+async def auth_cache_stats():
+    """Verified-token and principal caches of this worker: size, hits, misses."""
+    return {"tokens": verified_tokens.stats(), "principals": principal_cache.stats()}
+
+
+@router.get(
+    "/service/db/pool",
+    dependencies=[Depends(require_role("manager"))],
+)
+async def db_pool_stats():
+    """Connection pools of this worker: checked out, overflow, checkout wait, timeouts."""
+    pools = {"sync": pool_stats(database.engine), "async": pool_stats(database.async_engine.sync_engine)}
+    if database.write_engine is not None:
+        pools["sqlite_writer"] = pool_stats(database.write_engine)
+    return pools
+
+
+# SSE comment line sent when idle so proxies don't drop the connection
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+def format_sse(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def floor_event_source(request: Request, sub):
+    try:
+        if sub.reset:
+            sub.reset = False
+            yield format_sse("reset", {})
+        for change in sub.backlog:
+            yield format_sse("change", change, change["id"])
+
+        while not await request.is_disconnected():
+            try:
+                change = await asyncio.wait_for(sub.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if sub.reset:
+                # this client fell behind and events were dropped
+                sub.reset = False
+                yield format_sse("reset", {})
+            yield format_sse("change", change, change["id"])
+    finally:
+        sub.close()
+
+
+@router.get(
+    "/service/stream",
+    dependencies=[Depends(require_role(*CAN_VIEW))],
+)
+async def stream_changes(
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events feed of floor changes for the user's company.
+
+    Each `change` event carries table_id, step_index, status, updated_at and
+    which sub-entities changed. Reconnect with Last-Event-ID to replay what was
+    missed; a `reset` event means the gap couldn't be replayed and the client
+    should reload via /service/changes.
+    """
+    company_id = require_company_id(current_user)
+    sub = floor_stream.subscribe(company_id, last_event_id=last_event_id)
+    return StreamingResponse(
+        floor_event_source(request, sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+# WebSocket step commands -> the crud function behind the matching HTTP route
+# next/undo are applied with a single atomic UPDATE, see crud._atomic_step
+WS_STEP_COMMANDS = {
+    "next": crud_async.advance_step,
+    "undo": crud_async.revert_step,
+    "redo": crud_async.reapply_step,
+}
+
+WS_COMMANDS = {
+    **WS_STEP_COMMANDS,
+    "arrive": crud_async.mark_arrived,
+    "seat": crud_async.mark_seated,
+    "complete": crud_async.complete_table,
+}
+
+
+async def run_ws_command(db: AsyncSession, user: Principal, company_id: int, msg: dict) -> dict:
+    cmd = msg.get("cmd")
+    ref = msg.get("ref")
+    try:
+        if cmd not in WS_COMMANDS:
+            return {"type": "error", "ref": ref, "status": 400, "detail": f"Unknown cmd {cmd!r}"}
+        if user.role not in BATCH_OP_ROLES[cmd]:
+            return {"type": "error", "ref": ref, "status": 403, "detail": "Not authorized"}
+
+        table_id = str(msg.get("table_id"))
+        # optional "version" works like If-Match on the HTTP routes
+        version = msg.get("version")
+        if version is not None and (isinstance(version, bool) or not isinstance(version, int)):
+            return {"type": "error", "ref": ref, "status": 400, "detail": "version must be an integer"}
+        try:
+            if cmd in WS_STEP_COMMANDS:
+                t = await WS_STEP_COMMANDS[cmd](db, table_id, company_id, user.id, version)
+            else:
+                t = await crud_async.get_table(db, table_id, company_id=company_id)
+                if t:
+                    crud.check_version(t, version)
+                    t = await WS_COMMANDS[cmd](db, t, actor_user_id=user.id)
+            if t is None:
+                return {"type": "error", "ref": ref, "status": 404, "detail": "Table not found"}
+        except crud.StaleTableError as e:
+            return {"type": "error", "ref": ref, "status": 412, "detail": str(e)}
+        ack = step_response(t)
+        return {"type": "ack", "ref": ref, **ack.model_dump(mode="json")}
+    finally:
+        # give the connection back to the pool between taps
+        await db.close()
+
+
+@router.websocket("/service/ws")
+async def service_ws(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_write_db),
+):
+    """
+    Step command channel. Authenticate once with ?token=<JWT>, then send
+    {"cmd": "next"|"undo"|"redo"|"arrive"|"seat"|"complete", "table_id": ..., "ref": ...}
+    plus an optional "version" to make the command conditional.
+    Each command is answered with a StepAdvanceResponse-shaped "ack" (or an
+    "error") echoing `ref`; changes from every client of the company are pushed
+    as {"type": "change", ...} like the SSE stream, and {"type": "reset"} means
+    changes were dropped and the client should reload via /service/changes.
+    """
+    try:
+        user = await principal_from_token(db, token)
+        company_id = require_company_id(user)
+        if user.role not in CAN_VIEW:
+            raise HTTPException(status_code=403, detail="Not authorized")
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+    finally:
+        await db.close()
+
+    await websocket.accept()
+    sub = floor_stream.subscribe(company_id)
+    send_lock = asyncio.Lock()
+
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def forward_changes():
+        while True:
+            change = await sub.get()
+            if sub.reset:
+                # this client fell behind and events were dropped
+                sub.reset = False
+                await send({"type": "reset"})
+            await send({"type": "change", **change})
+
+    forwarder = asyncio.create_task(forward_changes())
+    try:
+        while True:
+            try:
+                msg = json.loads(await websocket.receive_text())
+            except ValueError:
+                await send({"type": "error", "ref": None, "status": 400, "detail": "Invalid JSON"})
+                continue
+            if not isinstance(msg, dict):
+                await send({"type": "error", "ref": None, "status": 400, "detail": "Expected a JSON object"})
+                continue
+            reply = await run_ws_command(db, user, company_id, msg)
+            await send(reply)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        forwarder.cancel()
+        sub.close()
+
+
 @router.post(
     "/service/tables",
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_TABLE_EDIT))],
 )
-def create_table(
+async def create_table(
     payload: TableCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    service_date: Optional[date] = Query(None),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
 ):
     company_id = require_company_id(current_user)
 
     try:
-        # ✅ 1-day mode: CRUD sets service_date = date.today()
-        t = crud.create_table(
+        # service_date defaults to the company's current service day
+        t = await crud_async.create_table(
             db,
             company_id=company_id,
             table_number=payload.table_number,
@@ -107,32 +527,115 @@ def create_table(
             location=payload.location,
             guest_count=payload.guest_count,
             notes=payload.notes,
+            service_date=service_date,
         )
     except crud.InvalidTurnError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except crud.TableUseConflictError as e:
         raise HTTPException(status_code=409, detail=str(e))
 
-    t = crud.get_table(db, t.id, company_id=company_id)
     return t
 
 
+@router.post(
+    "/service/tables/bulk",
+    response_model=TableBulkCreateResponse,
+    dependencies=[Depends(require_role(*CAN_TABLE_EDIT))],
+)
+async def create_tables_bulk(
+    payload: TableBulkCreate,
+    service_date: Optional[date] = Query(None),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Pre-service floor setup: create every table/turn in one request.
+    Rows that clash with an existing table use are reported in `conflicts`;
+    the rest are still created.
+    """
+    company_id = require_company_id(current_user)
+
+    created, conflicts = await crud_async.create_tables_bulk(
+        db,
+        company_id=company_id,
+        tables=[t.model_dump() for t in payload.tables],
+        actor_user_id=current_user.id,
+        service_date=service_date,
+    )
+
+    return TableBulkCreateResponse(
+        created=[TableListItem.model_validate(t) for t in created],
+        conflicts=conflicts,
+    )
+
+
+@router.post(
+    "/service/close-out",
+    response_model=CloseOutResponse,
+    dependencies=[Depends(require_role("manager"))],
+)
+async def close_out(
+    service_date: Optional[date] = Query(None),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """End of night: complete every table of the day (default: the current one) that is still open."""
+    company_id = require_company_id(current_user)
+    service_date = service_date or await crud_async.current_service_day(db, company_id)
+    closed = await crud_async.close_out_day(db, company_id, service_date, actor_user_id=current_user.id)
+    return CloseOutResponse(service_date=service_date, closed=len(closed), table_ids=[r.id for r in closed])
+
+
 @router.get(
     "/service/tables/{table_id}",
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_VIEW))],
 )
-def get_table_detail(
+async def get_table_detail(
     table_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
+    if if_none_match:
+        # answer 304 from one indexed column before touching guests/wines
+        version = await crud_async.get_table_version(db, table_id, company_id=company_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Table not found")
+        if etag_matches(if_none_match, table_etag(version)):
+            return not_modified(table_etag(version))
+
+    t = await get_table_or_404(db, table_id, company_id)
+    response.headers["ETag"] = table_etag(t.version)
+    return t
+
+
+@router.get(
+    "/service/tables/{table_id}/at",
+    response_model=TableStateAt,
+    dependencies=[Depends(require_role(*CAN_VIEW))],
+)
+async def get_table_at(
+    table_id: str,
+    ts: datetime = Query(..., description="ISO timestamp; naive values are UTC"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """What the table looked like at `ts`, rebuilt from its snapshots and event log."""
+    company_id = require_company_id(current_user)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+    t = await crud_async.get_table(db, table_id, company_id=company_id)
     if not t:
         raise HTTPException(status_code=404, detail="Table not found")
-    return t
+    state = await db.run_sync(replay_table, company_id, t.service_date, table_id, ts)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Table did not exist yet at that time")
+    return TableStateAt(as_of=ts, **state)
 
 
 @router.patch(
@@ -140,22 +643,62 @@ def get_table_detail(
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_TABLE_EDIT))],
 )
-def patch_table(
+async def patch_table(
     table_id: str,
     payload: TablePatch,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Table not found")
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
 
     data = payload.model_dump(exclude_unset=True)
 
     try:
-        return crud.patch_table(db, t, data, actor_user_id=current_user.id)
+        with precondition_guard():
+            return await crud_async.patch_table(db, t, data, actor_user_id=current_user.id)
+    except crud.TableUseConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post(
+    "/service/tables/{table_id}/batch",
+    response_model=TableDetail,
+    dependencies=[Depends(require_role(*CAN_VIEW))],
+)
+async def batch(
+    table_id: str,
+    payload: TableBatchRequest,
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
+):
+    """
+    Apply several table operations (steps, guests, wines, table patch) in order,
+    in one transaction with a single commit and one TableDetail response.
+    """
+    company_id = require_company_id(current_user)
+
+    for i, op in enumerate(payload.ops):
+        if current_user.role not in BATCH_OP_ROLES[op.op]:
+            raise HTTPException(status_code=403, detail=f"ops[{i}]: Not authorized for {op.op}")
+
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
+    ops = [op.model_dump(exclude_unset=True) for op in payload.ops]
+
+    try:
+        with precondition_guard():
+            return await crud_async.apply_batch(db, t, ops, actor_user_id=current_user.id)
+    except crud.BatchTargetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except crud.BatchWinesLockedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except crud.BatchOperationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except crud.TableUseConflictError as e:
         raise HTTPException(status_code=409, detail=str(e))
 
@@ -165,17 +708,18 @@ def patch_table(
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_TABLE_EDIT))],
 )
-def arrive(
+async def arrive(
     table_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Table not found")
-    return crud.mark_arrived(db, t, actor_user_id=current_user.id)
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
+    with precondition_guard():
+        return await crud_async.mark_arrived(db, t, actor_user_id=current_user.id)
 
 
 @router.post(
@@ -183,17 +727,18 @@ def arrive(
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_TABLE_EDIT))],
 )
-def seat(
+async def seat(
     table_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Table not found")
-    return crud.mark_seated(db, t, actor_user_id=current_user.id)
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
+    with precondition_guard():
+        return await crud_async.mark_seated(db, t, actor_user_id=current_user.id)
 
 
 @router.post(
@@ -201,17 +746,18 @@ def seat(
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_TABLE_EDIT))],
 )
-def complete(
+async def complete(
     table_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Table not found")
-    return crud.complete_table(db, t, actor_user_id=current_user.id)
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
+    with precondition_guard():
+        return await crud_async.complete_table(db, t, actor_user_id=current_user.id)
 
 
 @router.post(
@@ -219,19 +765,21 @@ def complete(
     response_model=StepAdvanceResponse,
     dependencies=[Depends(require_role(*CAN_STEPS))],
 )
-def next_step(
+async def next_step(
     table_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
+    expected_version = parse_if_match(if_match)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
+    # one conditional UPDATE ... RETURNING, no read of the table first
+    with precondition_guard():
+        row = await crud_async.advance_step(db, table_id, company_id, current_user.id, expected_version)
+    if row is None:
         raise HTTPException(status_code=404, detail="Table not found")
-
-    t = crud.next_step(db, t, actor_user_id=current_user.id)
-    return StepAdvanceResponse(table_id=t.id, step_index=t.step_index, updated_at=t.updated_at)
+    return step_response(row)
 
 
 @router.post(
@@ -239,19 +787,43 @@ def next_step(
     response_model=StepAdvanceResponse,
     dependencies=[Depends(require_role(*CAN_STEPS))],
 )
-def undo_step(
+async def undo_step(
     table_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
+    expected_version = parse_if_match(if_match)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
+    # one conditional UPDATE ... RETURNING, no read of the table first
+    with precondition_guard():
+        row = await crud_async.revert_step(db, table_id, company_id, current_user.id, expected_version)
+    if row is None:
         raise HTTPException(status_code=404, detail="Table not found")
+    return step_response(row)
 
-    t = crud.undo_step(db, t, actor_user_id=current_user.id)
-    return StepAdvanceResponse(table_id=t.id, step_index=t.step_index, updated_at=t.updated_at)
+
+@router.post(
+    "/service/tables/{table_id}/redo",
+    response_model=StepAdvanceResponse,
+    dependencies=[Depends(require_role(*CAN_STEPS))],
+)
+async def redo_step(
+    table_id: str,
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
+):
+    company_id = require_company_id(current_user)
+    expected_version = parse_if_match(if_match)
+
+    # one conditional UPDATE ... RETURNING, no read of the table first
+    with precondition_guard():
+        row = await crud_async.reapply_step(db, table_id, company_id, current_user.id, expected_version)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Table not found")
+    return step_response(row)
 
 
 @router.post(
@@ -259,19 +831,20 @@ def undo_step(
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_GUESTS))],
 )
-def add_guest(
+async def add_guest(
     table_id: str,
     payload: GuestCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Table not found")
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
 
-    return crud.add_guest(db, t, payload.model_dump(exclude_unset=True), actor_user_id=current_user.id)
+    with precondition_guard():
+        return await crud_async.add_guest(db, t, payload.model_dump(exclude_unset=True), actor_user_id=current_user.id)
 
 
 @router.patch(
@@ -279,28 +852,25 @@ def add_guest(
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_GUESTS))],
 )
-def patch_guest(
+async def patch_guest(
     table_id: str,
     guest_id: str,
     payload: GuestPatch,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Table not found")
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
 
-    g = (
-        db.query(ServiceGuest)
-        .filter(ServiceGuest.id == guest_id, ServiceGuest.table_id == table_id)
-        .first()
-    )
+    g = find_by_id(t.guests, guest_id)
     if not g:
         raise HTTPException(status_code=404, detail="Guest not found")
 
-    return crud.update_guest(db, t, g, payload.model_dump(exclude_unset=True), actor_user_id=current_user.id)
+    with precondition_guard():
+        return await crud_async.update_guest(db, t, g, payload.model_dump(exclude_unset=True), actor_user_id=current_user.id)
 
 
 @router.delete(
@@ -308,27 +878,24 @@ def patch_guest(
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_GUESTS))],
 )
-def delete_guest(
+async def delete_guest(
     table_id: str,
     guest_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Table not found")
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
 
-    g = (
-        db.query(ServiceGuest)
-        .filter(ServiceGuest.id == guest_id, ServiceGuest.table_id == table_id)
-        .first()
-    )
+    g = find_by_id(t.guests, guest_id)
     if not g:
         raise HTTPException(status_code=404, detail="Guest not found")
 
-    return crud.remove_guest(db, t, g, actor_user_id=current_user.id)
+    with precondition_guard():
+        return await crud_async.remove_guest(db, t, g, actor_user_id=current_user.id)
 
 
 @router.post(
@@ -336,22 +903,23 @@ def delete_guest(
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_WINES))],
 )
-def add_wine(
+async def add_wine(
     table_id: str,
     payload: WineEntryCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Table not found")
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
 
     if not crud.ensure_wines_unlocked(t):
         raise HTTPException(status_code=409, detail="Wines are locked until arrival")
 
-    return crud.add_wine(db, t, payload.model_dump(exclude_unset=True), actor_user_id=current_user.id)
+    with precondition_guard():
+        return await crud_async.add_wine(db, t, payload.model_dump(exclude_unset=True), actor_user_id=current_user.id)
 
 
 @router.patch(
@@ -359,31 +927,28 @@ def add_wine(
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_WINES))],
 )
-def patch_wine(
+async def patch_wine(
     table_id: str,
     wine_entry_id: str,
     payload: WineEntryPatch,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Table not found")
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
 
     if not crud.ensure_wines_unlocked(t):
         raise HTTPException(status_code=409, detail="Wines are locked until arrival")
 
-    w = (
-        db.query(ServiceTableWine)
-        .filter(ServiceTableWine.id == wine_entry_id, ServiceTableWine.table_id == table_id)
-        .first()
-    )
+    w = find_by_id(t.wines, wine_entry_id)
     if not w:
         raise HTTPException(status_code=404, detail="Wine entry not found")
 
-    return crud.update_wine(db, t, w, payload.model_dump(exclude_unset=True), actor_user_id=current_user.id)
+    with precondition_guard():
+        return await crud_async.update_wine(db, t, w, payload.model_dump(exclude_unset=True), actor_user_id=current_user.id)
 
 
 @router.delete(
@@ -391,27 +956,24 @@ def patch_wine(
     response_model=TableDetail,
     dependencies=[Depends(require_role(*CAN_WINES))],
 )
-def delete_wine(
+async def delete_wine(
     table_id: str,
     wine_entry_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
     company_id = require_company_id(current_user)
 
-    t = crud.get_table(db, table_id, company_id=company_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Table not found")
+    t = await get_table_or_404(db, table_id, company_id)
+    check_if_match(t, if_match)
 
     if not crud.ensure_wines_unlocked(t):
         raise HTTPException(status_code=409, detail="Wines are locked until arrival")
 
-    w = (
-        db.query(ServiceTableWine)
-        .filter(ServiceTableWine.id == wine_entry_id, ServiceTableWine.table_id == table_id)
-        .first()
-    )
+    w = find_by_id(t.wines, wine_entry_id)
     if not w:
         raise HTTPException(status_code=404, detail="Wine entry not found")
 
-    return crud.remove_wine(db, t, w, actor_user_id=current_user.id)
+    with precondition_guard():
+        return await crud_async.remove_wine(db, t, w, actor_user_id=current_user.id)
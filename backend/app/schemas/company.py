@@ -1,11 +1,38 @@
 # backend/app/schemas/company.py
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+def check_timezone(tz: Optional[str]) -> Optional[str]:
+    """An IANA zone name ZoneInfo can load, e.g. "Europe/Paris"."""
+    if tz is not None:
+        try:
+            ZoneInfo(tz)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone {tz!r}")
+    return tz
 
-from pydantic import BaseModel
 
 class CompanyCreate(BaseModel):
     name: str
+    # the service day runs from this local hour to the same hour the next day
+    timezone: str = "UTC"
+    service_day_cutoff_hour: int = Field(4, ge=0, le=23)
+
+    _timezone = field_validator("timezone")(check_timezone)
+
+
+class CompanyUpdate(BaseModel):
+    name: Optional[str] = None
+    timezone: Optional[str] = None
+    service_day_cutoff_hour: Optional[int] = Field(None, ge=0, le=23)
+
+    _timezone = field_validator("timezone")(check_timezone)
+
 
 class CompanyOut(CompanyCreate):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
-    class Config:
-        orm_mode = True
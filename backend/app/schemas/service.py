@@ -1,9 +1,9 @@
 # backend/app/schemas/service.py
 from datetime import datetime, date
-from typing import List, Optional
+from typing import Annotated, Dict, List, Literal, Optional, Type, Union
 from pydantic import BaseModel, Field
 
-from app.models.service import TableStatus, WineKind
+from app.models.service import StepEventType, TableStatus, WineKind
 
 
 # ---------- Tables ----------
@@ -40,6 +40,7 @@ class TableListItem(BaseModel):
     step_index: int
     guest_count: int
     updated_at: datetime
+    version: int
 
     class Config:
         from_attributes = True
@@ -49,7 +50,31 @@ class TableListResponse(BaseModel):
     items: List[TableListItem]
     page: int
     limit: int
-    total: int
+    total: Optional[int] = None  # None when include_total=false
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
+
+class TableBulkCreate(BaseModel):
+    # whole floor plan for one service
+    tables: List[TableCreate] = Field(min_length=1, max_length=500)
+
+
+class TableBulkConflict(BaseModel):
+    index: int  # position in TableBulkCreate.tables
+    table_number: str
+    turn: int
+    detail: str
+
+
+class TableBulkCreateResponse(BaseModel):
+    created: List[TableListItem]
+    conflicts: List[TableBulkConflict]
+
+
+class CloseOutResponse(BaseModel):
+    service_date: date
+    closed: int
+    table_ids: List[str]
 
 
 class GuestOut(BaseModel):
@@ -95,11 +120,14 @@ class TableDetail(BaseModel):
     completed_at: Optional[datetime] = None
 
     step_index: int
+    undo_depth: int = 0
+    redo_depth: int = 0
     guest_count: int
     notes: Optional[str] = None
 
     created_at: datetime
     updated_at: datetime
+    version: int  # send back as If-Match: "v<version>" to make a conditional write
 
     guests: List[GuestOut] = []
     wines: List[WineEntryOut] = []
@@ -108,11 +136,129 @@ class TableDetail(BaseModel):
         from_attributes = True
 
 
+# ---------- Sync ----------
+class Tombstone(BaseModel):
+    id: str
+    table_id: str
+    deleted_at: datetime
+
+
+class ServiceChangesResponse(BaseModel):
+    tables: List[TableListItem]
+    guests: List[GuestOut]
+    wines: List[WineEntryOut]
+    deleted_guests: List[Tombstone] = []
+    deleted_wines: List[Tombstone] = []
+    next_cursor: str
+
+
+# ---------- Event log ----------
+class StepEventOut(BaseModel):
+    id: str
+    table_id: str
+    service_date: date
+    event_type: str
+    from_step: Optional[int] = None
+    to_step: Optional[int] = None
+    payload: Optional[dict] = None
+    actor_user_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# ---------- Event payloads ----------
+# What crud stores in ServiceStepEvent.payload, per event type. Step moves
+# (next/undo/redo/arrive/seat) carry no payload, nor does a regular complete.
+# `values` carries the new field values so app.services.table_replay can
+# rebuild a table's state from its events.
+class UpdatePayload(BaseModel):
+    created: Optional[bool] = None
+    service_date: Optional[date] = None
+    fields: Optional[List[str]] = None
+    values: Optional[dict] = None
+    wine_entry_id: Optional[str] = None  # wine entry patch
+
+
+class GuestEventPayload(BaseModel):
+    guest_id: str
+    fields: Optional[List[str]] = None
+    values: Optional[dict] = None  # guest add: every field; guest update: the changed ones
+
+
+class WineEntrySnapshot(BaseModel):
+    id: str
+    kind: WineKind
+    wine_id: Optional[str] = None
+    label: str
+    quantity: float
+
+
+class WineEventPayload(BaseModel):
+    wine_entry_id: str
+    wine_id: Optional[str] = None
+    wine_entry: Optional[WineEntrySnapshot] = None  # what was added / removed
+
+
+class CompletePayload(BaseModel):
+    closed_out: Optional[bool] = None  # completed by the end-of-night close-out
+
+
+EVENT_PAYLOADS: Dict[StepEventType, Type[BaseModel]] = {
+    StepEventType.COMPLETE: CompletePayload,
+    StepEventType.UPDATE: UpdatePayload,
+    StepEventType.GUEST_ADD: GuestEventPayload,
+    StepEventType.GUEST_UPDATE: GuestEventPayload,
+    StepEventType.GUEST_REMOVE: GuestEventPayload,
+    StepEventType.WINE_ADD: WineEventPayload,
+    StepEventType.WINE_REMOVE: WineEventPayload,
+}
+
+
+def event_payload(event_type: StepEventType, **data) -> dict:
+    """Validate a payload against its event type's schema and return it JSON-ready."""
+    return EVENT_PAYLOADS[event_type](**data).model_dump(mode="json", exclude_none=True)
+
+
+# ---------- Point-in-time ----------
+class GuestState(BaseModel):
+    id: str
+    name: Optional[str] = None
+    allergy: Optional[str] = None
+    protein_sub: Optional[str] = None
+    doneness: Optional[str] = None
+    substitutions: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class TableStateAt(BaseModel):
+    table_id: str
+    as_of: datetime
+    table_number: Optional[str] = None
+    turn: int
+    location: Optional[str] = None
+    status: TableStatus
+    guest_count: int
+    notes: Optional[str] = None
+    step_index: int
+    undo_depth: int = 0
+    redo_depth: int = 0
+    arrived_at: Optional[datetime] = None
+    seated_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    guests: List[GuestState] = []
+    wines: List[WineEntrySnapshot] = []
+
+
 # ---------- Steps ----------
 class StepAdvanceResponse(BaseModel):
     table_id: str
     step_index: int
     updated_at: datetime
+    version: int
+    undo_depth: int = 0
+    redo_depth: int = 0
 
 
 # ---------- Guests ----------
@@ -145,3 +291,65 @@ class WineEntryCreate(BaseModel):
 class WineEntryPatch(BaseModel):
     label: Optional[str] = None
     quantity: Optional[float] = Field(default=None, ge=0.01)
+
+
+# ---------- Batch ----------
+class StepOp(BaseModel):
+    op: Literal["next", "undo", "redo", "arrive", "seat", "complete"]
+
+
+class TablePatchOp(BaseModel):
+    op: Literal["patch"]
+    data: TablePatch
+
+
+class GuestAddOp(BaseModel):
+    op: Literal["guest_add"]
+    data: GuestCreate = GuestCreate()
+
+
+class GuestPatchOp(BaseModel):
+    op: Literal["guest_patch"]
+    guest_id: str
+    data: GuestPatch
+
+
+class GuestRemoveOp(BaseModel):
+    op: Literal["guest_remove"]
+    guest_id: str
+
+
+class WineAddOp(BaseModel):
+    op: Literal["wine_add"]
+    data: WineEntryCreate
+
+
+class WinePatchOp(BaseModel):
+    op: Literal["wine_patch"]
+    wine_entry_id: str
+    data: WineEntryPatch
+
+
+class WineRemoveOp(BaseModel):
+    op: Literal["wine_remove"]
+    wine_entry_id: str
+
+
+TableBatchOp = Annotated[
+    Union[
+        StepOp,
+        TablePatchOp,
+        GuestAddOp,
+        GuestPatchOp,
+        GuestRemoveOp,
+        WineAddOp,
+        WinePatchOp,
+        WineRemoveOp,
+    ],
+    Field(discriminator="op"),
+]
+
+
+class TableBatchRequest(BaseModel):
+    # applied in order, in one transaction
+    ops: List[TableBatchOp] = Field(min_length=1, max_length=100)
@@ -0,0 +1,159 @@
+# backend/app/services/event_archive.py
+"""
+Archival of the service event log.
+
+Closed service days (service_date before the company's current service day,
+which follows its timezone and cutoff hour) are moved out of
+service_step_events into one gzip NDJSON file per company per day:
+
+    <EVENT_ARCHIVE_DIR>/<company_id>/<YYYY-MM-DD>.ndjson.gz
+
+read_day() serves a day from the archive file and whatever is still in the
+database, so callers don't need to know whether a day was archived.
+"""
+import gzip
+import json
+import os
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import service as crud
+from app.models.service import ServiceStepEvent, ServiceTableSnapshot
+
+DELETE_CHUNK = 500
+
+
+def archive_root(root: Optional[str] = None) -> Path:
+    return Path(root or settings.EVENT_ARCHIVE_DIR)
+
+
+def archive_path(company_id: int, service_date: date, root: Optional[str] = None) -> Path:
+    return archive_root(root) / str(company_id) / f"{service_date.isoformat()}.ndjson.gz"
+
+
+def event_record(ev: ServiceStepEvent) -> dict:
+    return {
+        "id": ev.id,
+        "table_id": ev.table_id,
+        "company_id": ev.company_id,
+        "service_date": ev.service_date.isoformat(),
+        "event_type": ev.event_type,
+        "from_step": ev.from_step,
+        "to_step": ev.to_step,
+        "payload": ev.payload,
+        "actor_user_id": ev.actor_user_id,
+        "created_at": ev.created_at.isoformat(),
+    }
+
+
+def _read_file(path: Path) -> List[dict]:
+    if not path.exists():
+        return []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_file(path: Path, records: List[dict]):
+    # write next to the target and rename, so readers never see half a file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r, separators=(",", ":")) + "\n")
+    os.replace(tmp, path)
+
+
+def read_archive(company_id: int, service_date: date, root: Optional[str] = None) -> List[dict]:
+    """Only what was archived for the day, without touching the database."""
+    return _read_file(archive_path(company_id, service_date, root))
+
+
+def _sort_key(record: dict):
+    return record["created_at"], record["id"]
+
+
+def archive_day(db: Session, company_id: int, service_date: date, root: Optional[str] = None) -> int:
+    """
+    Move one closed day's events into its archive file and delete them from
+    the database. Events written for the day after an earlier run are merged
+    into the existing file. Returns the number of events archived.
+    """
+    if service_date >= crud.current_service_day(db, company_id):
+        raise ValueError(f"Service day {service_date} is not closed yet")
+
+    events = (
+        db.query(ServiceStepEvent)
+        .filter(ServiceStepEvent.company_id == company_id)
+        .filter(ServiceStepEvent.service_date == service_date)
+        .order_by(ServiceStepEvent.created_at, ServiceStepEvent.id)
+        .all()
+    )
+    if not events:
+        return 0
+
+    path = archive_path(company_id, service_date, root)
+    records = {r["id"]: r for r in _read_file(path)}
+    records.update((ev.id, event_record(ev)) for ev in events)
+    _write_file(path, sorted(records.values(), key=_sort_key))
+
+    # only delete what was written out; anything inserted meanwhile stays for the next run
+    ids = [ev.id for ev in events]
+    for i in range(0, len(ids), DELETE_CHUNK):
+        db.query(ServiceStepEvent).filter(ServiceStepEvent.id.in_(ids[i : i + DELETE_CHUNK])).delete(
+            synchronize_session=False
+        )
+    # replay of an archived day starts from the file, its snapshots aren't needed anymore
+    db.query(ServiceTableSnapshot).filter(
+        ServiceTableSnapshot.company_id == company_id,
+        ServiceTableSnapshot.service_date == service_date,
+    ).delete(synchronize_session=False)
+    db.commit()
+    return len(ids)
+
+
+def archive_closed_days(
+    db: Session,
+    before: Optional[date] = None,
+    root: Optional[str] = None,
+) -> Dict[Tuple[int, date], int]:
+    """
+    Archive every (company, day) still in the database that is closed: before
+    the company's current service day and, if given, before `before`.
+    """
+    q = db.query(ServiceStepEvent.company_id, ServiceStepEvent.service_date)
+    if before is not None:
+        q = q.filter(ServiceStepEvent.service_date < before)
+    days = q.distinct().order_by(ServiceStepEvent.service_date, ServiceStepEvent.company_id).all()
+    # between midnight and a company's cutoff hour, yesterday's night is still open
+    return {
+        (c, d): archive_day(db, c, d, root) for c, d in days if d < crud.current_service_day(db, c)
+    }
+
+
+def read_day(
+    db: Session,
+    company_id: int,
+    service_date: date,
+    table_id: Optional[str] = None,
+    root: Optional[str] = None,
+) -> List[dict]:
+    """All events of a service day in created_at order, archived or not."""
+    records = {r["id"]: r for r in read_archive(company_id, service_date, root)}
+
+    q = (
+        db.query(ServiceStepEvent)
+        .filter(ServiceStepEvent.company_id == company_id)
+        .filter(ServiceStepEvent.service_date == service_date)
+    )
+    if table_id:
+        q = q.filter(ServiceStepEvent.table_id == table_id)
+    records.update((ev.id, event_record(ev)) for ev in q.all())
+
+    out = sorted(records.values(), key=_sort_key)
+    if table_id:
+        out = [r for r in out if r["table_id"] == table_id]
+    return out
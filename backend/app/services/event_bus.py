@@ -0,0 +1,198 @@
+# backend/app/services/event_bus.py
+"""
+In-process publish/subscribe bus for committed service changes.
+
+crud.service publishes one tuple of ServiceEvent per commit (one event per
+ServiceStepEvent row written). Publishing never blocks the request: every
+subscriber has its own bounded queue, and when a queue is full the commit's
+events are dropped for that subscriber and counted.
+
+- sync subscribers: bus.subscribe(handler) -> handler(events) runs on the
+  subscriber's own daemon thread
+- asyncio subscribers: bus.subscribe_async() inside a running loop, then
+  `await sub.get()`
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import queue
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ServiceEvent:
+    company_id: int
+    table_id: str
+    event_type: str  # StepEventType value
+    from_step: Optional[int] = None
+    to_step: Optional[int] = None
+    guest_id: Optional[str] = None
+    wine_entry_id: Optional[str] = None
+    actor_user_id: Optional[int] = None
+    # table state right after the commit
+    step_index: int = 0
+    status: str = "open"
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
+    occurred_at: datetime = field(default_factory=datetime.utcnow)
+
+
+EventBatch = Tuple[ServiceEvent, ...]
+
+
+class _Subscriber(ABC):
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @abstractmethod
+    def offer(self, batch: EventBatch):
+        """Hand a committed batch over without blocking the publisher."""
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queued": self.qsize(),
+            "maxsize": self.maxsize,
+        }
+
+    @abstractmethod
+    def qsize(self) -> int:
+        ...
+
+
+class SyncSubscription(_Subscriber):
+    def __init__(self, bus: "EventBus", handler: Callable[[EventBatch], None], name: str, maxsize: int):
+        super().__init__(name, maxsize)
+        self._bus = bus
+        self._handler = handler
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name=f"event-bus-{name}", daemon=True)
+        self._thread.start()
+
+    def offer(self, batch: EventBatch):
+        try:
+            self._queue.put_nowait(batch)
+        except queue.Full:
+            self.dropped += 1
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            try:
+                self._handler(batch)
+                self.delivered += 1
+            except Exception:
+                self.errors += 1
+                logger.exception("event bus subscriber %s failed", self.name)
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until everything queued so far was handled (tests, shutdown)."""
+        self._queue.join()
+
+    def close(self):
+        self._bus.unsubscribe(self)
+        # the sentinel is the one put that may block, never on the write path
+        self._queue.put(None)
+
+
+class AsyncSubscription(_Subscriber):
+    def __init__(self, bus: "EventBus", name: str, maxsize: int):
+        super().__init__(name, maxsize)
+        self._bus = bus
+        self.loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, batch: EventBatch):
+        # publishers run on request threads; hand over to the subscriber's loop
+        try:
+            self.loop.call_soon_threadsafe(self._put, batch)
+        except RuntimeError:
+            # the loop is closed and nobody will read this queue again; the
+            # publisher's commit already happened, so don't fail it
+            self.dropped += 1
+            self.close()
+
+    def _put(self, batch: EventBatch):
+        try:
+            self._queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    async def get(self) -> EventBatch:
+        batch = await self._queue.get()
+        self.delivered += 1
+        return batch
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self, default_maxsize: int = 1000):
+        self.default_maxsize = default_maxsize
+        self.published = 0
+        self._lock = threading.Lock()
+        self._subscribers: List[_Subscriber] = []
+
+    def publish(self, events: Sequence[ServiceEvent]):
+        if not events:
+            return
+        batch = tuple(events)
+        with self._lock:
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.offer(batch)
+
+    def subscribe(
+        self,
+        handler: Callable[[EventBatch], None],
+        name: Optional[str] = None,
+        maxsize: Optional[int] = None,
+    ) -> SyncSubscription:
+        sub = SyncSubscription(self, handler, name or getattr(handler, "__name__", "sync"), maxsize or self.default_maxsize)
+        with self._lock:
+            self._subscribers.append(sub)
+        return sub
+
+    def subscribe_async(self, name: str = "async", maxsize: Optional[int] = None) -> AsyncSubscription:
+        """Must be called from the event loop that will consume the subscription."""
+        sub = AsyncSubscription(self, name, maxsize or self.default_maxsize)
+        with self._lock:
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: _Subscriber):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {"published": self.published, "subscribers": [s.stats() for s in subscribers]}
+
+
+event_bus = EventBus()
@@ -0,0 +1,327 @@
+# backend/app/services/event_journal.py
+"""
+Write-behind journal for service step events.
+
+By default (EVENT_JOURNAL_MODE=inline) crud writes a mutation's events in the
+same commit as the state change. With EVENT_JOURNAL_MODE=write_behind the
+state change commits on its own and the event rows are handed to this
+journal instead:
+
+- every row is appended to a local NDJSON spool file first, then put on a
+  bounded in-process queue (a full queue blocks the caller, it never drops;
+  callers on the event loop hand this step to the default executor)
+- a background thread drains the queue and inserts batches with one
+  executemany per batch
+- once everything spooled is in the database the spool is truncated; rows
+  left in it after a crash are inserted by recover() on the next start
+
+Rows are only spooled after the state change committed, so a crash in between
+loses that mutation's events. Readers of the event log (changes-feed
+tombstones, /service/events) see events late: up to max_lag() while flushes
+succeed, longer while they fail. pending_since() tells the changes feed how
+far its cursor may advance without skipping events still in the queue.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.service import ServiceStepEvent
+
+logger = logging.getLogger(__name__)
+
+# longest pause between retries of a failed flush
+MAX_BACKOFF_SECONDS = 5.0
+
+EVENT_COLUMNS = (
+    "id",
+    "table_id",
+    "company_id",
+    "service_date",
+    "event_type",
+    "from_step",
+    "to_step",
+    "payload",
+    "actor_user_id",
+    "created_at",
+)
+
+
+def event_row(ev: ServiceStepEvent) -> dict:
+    row = {c: getattr(ev, c) for c in EVENT_COLUMNS}
+    row["event_type"] = getattr(row["event_type"], "value", row["event_type"])
+    return row
+
+
+def _log_failure(fut):
+    if not fut.cancelled() and fut.exception() is not None:
+        logger.error("event journal append failed", exc_info=fut.exception())
+
+
+def _dump(row: dict) -> str:
+    data = dict(row, service_date=row["service_date"].isoformat(), created_at=row["created_at"].isoformat())
+    return json.dumps(data, separators=(",", ":"))
+
+
+def _load(line: str) -> dict:
+    row = json.loads(line)
+    row["service_date"] = date.fromisoformat(row["service_date"])
+    row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return row
+
+
+class EventJournal:
+    def __init__(self):
+        self.enabled = False
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._spool_path: Optional[Path] = None
+        self._spool = None
+        self._queue: queue.Queue = queue.Queue()
+        self._batch_size = 500
+        self._flush_interval = 0.2
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._idle = threading.Condition(self._lock)
+        # id -> created_at of appended rows not yet in the database
+        self._pending: Dict[str, datetime] = {}
+
+        self.appended = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.blocked = 0
+        self.recovered = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(
+        self,
+        session_factory: Callable[[], Session],
+        spool_path: str,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.2,
+    ):
+        """Recover whatever a previous process left in the spool, then start the writer."""
+        if self.enabled:
+            return
+        self._session_factory = session_factory
+        self._spool_path = Path(spool_path)
+        self._spool_path.parent.mkdir(parents=True, exist_ok=True)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._stopping.clear()
+
+        self.recover()
+        self._spool = open(self._spool_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="event-journal", daemon=True)
+        self._thread.start()
+        self.enabled = True
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Flush what's queued and stop the writer (shutdown, tests). Gives up
+        after `timeout` seconds, e.g. while the database is down; whatever is
+        unwritten stays in the spool for recover() on the next start.
+        """
+        with self._lock:
+            if not self.enabled:
+                return
+            # appends from now on are inserted directly, see append()
+            self.enabled = False
+        if not self.flush(timeout):
+            logger.warning(
+                "event journal stopped with %d events unwritten, left in %s", len(self._pending), self._spool_path
+            )
+        self._stopping.set()
+        self._thread.join(timeout)
+        with self._lock:
+            self._spool.close()
+            self._spool = None
+
+    def append(self, rows: List[dict]):
+        """
+        Spool and enqueue committed events. Blocks while the queue is full.
+        Rows staged while the journal was running but appended after stop()
+        are inserted right away instead.
+
+        Called on the event loop (crud run through AsyncSession.run_sync), the
+        fsync and a possibly blocking put go to the default executor instead,
+        so a full queue never stalls other connections. The rows count as
+        pending (see pending_since()) from this call on either way.
+        """
+        if not rows:
+            return
+        with self._lock:
+            running = self.enabled
+            if running:
+                self.appended += len(rows)
+                self._pending.update((row["id"], row["created_at"]) for row in rows)
+        if not running:
+            self._insert(rows)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            self._spool_and_enqueue(rows)
+        else:
+            loop.run_in_executor(None, self._spool_and_enqueue, rows).add_done_callback(_log_failure)
+
+    def _spool_and_enqueue(self, rows: List[dict]):
+        with self._lock:
+            spool = self._spool
+            if spool is not None:
+                for row in rows:
+                    spool.write(_dump(row) + "\n")
+                spool.flush()
+                os.fsync(spool.fileno())
+        if spool is None:
+            # stopped since append() took the rows
+            self._insert(rows)
+            self._done(rows)
+            return
+        # outside the lock: the writer takes it after every batch, which is what frees space
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                self.blocked += 1
+                self._queue.put(row)
+
+    def _done(self, rows: List[dict]):
+        with self._idle:
+            for row in rows:
+                self._pending.pop(row["id"], None)
+            # nothing pending => everything spooled so far is in the database;
+            # rows appended but not spooled yet are pending too, so none are lost
+            if not self._pending and self._spool is not None:
+                self._spool.truncate(0)
+                self._spool.seek(0)
+            self._idle.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every appended event is in the database; False if `timeout` ran out first."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def max_lag(self) -> timedelta:
+        """How late events reach the database while flushes succeed (at most one retry)."""
+        if not self.enabled:
+            return timedelta(0)
+        return timedelta(seconds=2 * self._flush_interval + MAX_BACKOFF_SECONDS)
+
+    def pending_since(self) -> Optional[datetime]:
+        """created_at of the oldest appended event that isn't in the database yet."""
+        with self._lock:
+            return min(self._pending.values()) if self._pending else None
+
+    def recover(self) -> int:
+        """Insert spooled events that didn't make it into the database, then empty the spool."""
+        if not self._spool_path.exists():
+            return 0
+        with open(self._spool_path, encoding="utf-8") as f:
+            rows = [_load(line) for line in f if line.strip()]
+        missing = []
+        if rows:
+            db = self._session_factory()
+            try:
+                ids = [r["id"] for r in rows]
+                existing = set()
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i : i + 500]
+                    existing.update(
+                        id_ for (id_,) in db.query(ServiceStepEvent.id).filter(ServiceStepEvent.id.in_(chunk))
+                    )
+                missing = [r for r in rows if r["id"] not in existing]
+                if missing:
+                    db.execute(insert(ServiceStepEvent), missing)
+                db.commit()
+            finally:
+                db.close()
+        self._spool_path.write_text("")
+        self.recovered += len(missing)
+        if missing:
+            logger.warning("event journal recovered %d events from %s", len(missing), self._spool_path)
+        return len(missing)
+
+    def _next_batch(self) -> List[dict]:
+        try:
+            batch = [self._queue.get(timeout=self._flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, rows: List[dict]):
+        db = self._session_factory()
+        try:
+            db.execute(insert(ServiceStepEvent), rows)
+            db.commit()
+        finally:
+            db.close()
+
+    def _write(self, batch: List[dict]):
+        started = time.perf_counter()
+        self._insert(batch)
+        ms = (time.perf_counter() - started) * 1000
+        self.written += len(batch)
+        self.batches += 1
+        self.last_flush_ms = ms
+        self.max_flush_ms = max(self.max_flush_ms, ms)
+        self._total_flush_ms += ms
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            while True:
+                try:
+                    self._write(batch)
+                    break
+                except Exception:
+                    # the rows are still in the spool; keep retrying rather than drop them
+                    self.failures += 1
+                    logger.exception("event journal flush of %d events failed", len(batch))
+                    if self._stopping.is_set():
+                        # stop() gave up waiting; recover() inserts them on the next start
+                        return
+                    time.sleep(min(MAX_BACKOFF_SECONDS, self._flush_interval * (2 ** min(self.failures, 5))))
+            self._done(batch)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "appended": self.appended,
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "blocked": self.blocked,
+            "recovered": self.recovered,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 3) if self.batches else 0.0,
+        }
+
+
+event_journal = EventJournal()
@@ -0,0 +1,137 @@
+# backend/app/services/floor_stream.py
+"""
+In-process fan-out of service floor changes to SSE subscribers.
+
+Subscribed to the service event bus: every committed mutation becomes one
+compact change per table.
+Each company keeps a short history so a reconnecting client can resume
+from its Last-Event-ID ("<epoch>-<seq>"); if the id has already fallen out
+of the history, or comes from another process (different epoch), the client
+is told to reset and reload.
+
+Only clients connected to the same worker process see each other's changes.
+"""
+import asyncio
+import threading
+import uuid
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Set
+
+from app.services.event_bus import EventBatch, ServiceEvent, event_bus
+
+
+class Subscription:
+    def __init__(self, stream: "FloorChangeStream", company_id: int, queue_size: int):
+        self._stream = stream
+        self.company_id = company_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.backlog: List[dict] = []
+        # set when the client missed events and has to reload from the REST API
+        self.reset = False
+
+    def push(self, change: dict):
+        # called from whatever thread committed the change
+        try:
+            self.loop.call_soon_threadsafe(self._put, change)
+        except RuntimeError:
+            # the client's loop is gone without closing the subscription;
+            # drop it so publish() still reaches everyone else
+            self.close()
+
+    def _put(self, change: dict):
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            self.reset = True
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def close(self):
+        self._stream.unsubscribe(self)
+
+
+class FloorChangeStream:
+    def __init__(self, history: int = 500, queue_size: int = 256):
+        self._history_size = history
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        self.epoch = uuid.uuid4().hex[:8]
+        # event ids are contiguous per company, so a resume gap is easy to spot
+        self._last_id: Dict[int, int] = defaultdict(int)
+        self._history: Dict[int, Deque[dict]] = defaultdict(lambda: deque(maxlen=self._history_size))
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+
+    def publish(self, company_id: int, change: dict) -> dict:
+        with self._lock:
+            self._last_id[company_id] += 1
+            event = dict(change, id=f"{self.epoch}-{self._last_id[company_id]}")
+            self._history[company_id].append(event)
+            subscribers = list(self._subscribers[company_id])
+
+        for sub in subscribers:
+            sub.push(event)
+        return event
+
+    def _seq(self, event_id: str) -> Optional[int]:
+        epoch, _, seq = event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def subscribe(self, company_id: int, last_event_id: Optional[str] = None) -> Subscription:
+        """
+        Must be called from the event loop that will consume the subscription.
+        Events after `last_event_id` still in the history are put in `backlog`.
+        """
+        sub = Subscription(self, company_id, self._queue_size)
+        with self._lock:
+            if last_event_id:
+                history = self._history[company_id]
+                last_seq = self._seq(last_event_id)
+                if last_seq is None or last_seq > self._last_id[company_id]:
+                    # id from another process / before a restart
+                    sub.reset = True
+                elif history and self._seq(history[0]["id"]) > last_seq + 1:
+                    # the events right after last_event_id were already evicted
+                    sub.reset = True
+                else:
+                    sub.backlog = [e for e in history if self._seq(e["id"]) > last_seq]
+            self._subscribers[company_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers[sub.company_id].discard(sub)
+
+
+def _changed_entity(ev: ServiceEvent) -> str:
+    if ev.guest_id:
+        return "guest"
+    if ev.wine_entry_id:
+        return "wine"
+    return "table"
+
+
+def compact_change(events: EventBatch) -> dict:
+    last = events[-1]
+    return {
+        "table_id": last.table_id,
+        "step_index": last.step_index,
+        "status": last.status,
+        "updated_at": last.updated_at.isoformat() if last.updated_at else None,
+        "version": last.version,
+        "changed": sorted({_changed_entity(ev) for ev in events}),
+        "events": [ev.event_type for ev in events],
+    }
+
+
+floor_stream = FloorChangeStream()
+
+
+def _on_service_events(events: EventBatch):
+    floor_stream.publish(events[-1].company_id, compact_change(events))
+
+
+floor_stream_subscription = event_bus.subscribe(_on_service_events, name="floor_stream")
@@ -1,10 +1,48 @@
 # app/services/inventory.py (or wherever your InventoryService lives)
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from app.models.inventory import InventoryItem
 from app.schemas.inventory import InventoryCreate, InventoryUpdate
 
+
+# Writes run as sync functions through db.run_sync, so they work both on an
+# AsyncSession and on the SQLite writer's session (see app.core.sqlite).
+
+def _get_item(db: Session, item_id: int, company_id: int) -> InventoryItem:
+    item = (
+        db.query(InventoryItem)
+        .filter(InventoryItem.id == item_id, InventoryItem.company_id == company_id)
+        .first()
+    )
+    if item is None:
+        raise HTTPException(status_code=404, detail="Inventory item not found")
+    return item
+
+
+def _create_item(db: Session, item: InventoryCreate, company_id: int) -> InventoryItem:
+    new_item = InventoryItem(**item.model_dump(), company_id=company_id)
+    db.add(new_item)
+    db.commit()
+    db.refresh(new_item)
+    return new_item
+
+
+def _update_item(db: Session, item_id: int, item_update: InventoryUpdate, company_id: int) -> InventoryItem:
+    item = _get_item(db, item_id, company_id)
+    for field, value in item_update.model_dump(exclude_unset=True).items():
+        setattr(item, field, value)
+    db.commit()
+    db.refresh(item)
+    return item
+
+
+def _delete_item(db: Session, item_id: int, company_id: int):
+    db.delete(_get_item(db, item_id, company_id))
+    db.commit()
+
+
 class InventoryService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -16,34 +54,14 @@ class InventoryService:
         return result.scalars().all()
 
     async def get_item_by_id(self, item_id: int, company_id: int):
-        result = await self.db.execute(
-            select(InventoryItem).where(
-                InventoryItem.id == item_id,
-                InventoryItem.company_id == company_id
-            )
-        )
-        item = result.scalar_one_or_none()
-        if item is None:
-            raise HTTPException(status_code=404, detail="Inventory item not found")
-        return item
+        return await self.db.run_sync(_get_item, item_id, company_id)
 
     async def create_item(self, item: InventoryCreate, company_id: int):
-        new_item = InventoryItem(**item.model_dump(), company_id=company_id)
-        self.db.add(new_item)
-        await self.db.commit()
-        await self.db.refresh(new_item)
-        return new_item
+        return await self.db.run_sync(_create_item, item, company_id)
 
     async def update_item(self, item_id: int, item_update: InventoryUpdate, company_id: int):
-        item = await self.get_item_by_id(item_id, company_id)
-        for field, value in item_update.model_dump(exclude_unset=True).items():
-            setattr(item, field, value)
-        await self.db.commit()
-        await self.db.refresh(item)
-        return item
+        return await self.db.run_sync(_update_item, item_id, item_update, company_id)
 
     async def delete_item(self, item_id: int, company_id: int):
-        item = await self.get_item_by_id(item_id, company_id)
-        await self.db.delete(item)
-        await self.db.commit()
+        await self.db.run_sync(_delete_item, item_id, company_id)
         return {"detail": "Item deleted successfully"}
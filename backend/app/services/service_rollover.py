@@ -0,0 +1,42 @@
+# backend/app/services/service_rollover.py
+"""
+Scheduled service-day rollover.
+
+Every SERVICE_ROLLOVER_SECONDS the app closes out (crud.close_out_before)
+all tables of earlier service days that were never completed, so open-table
+queries only ever see the current floor. "Earlier" is per company: a day
+only rolls over once the company's local cutoff hour has passed.
+
+It's off (SERVICE_ROLLOVER_SECONDS=0) until turned on; close-outs can always
+be run by hand (POST /service/close-out).
+"""
+import asyncio
+import logging
+from typing import Callable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.crud import service as crud
+
+logger = logging.getLogger(__name__)
+
+
+def run_rollover(session_factory: Callable[[], Session]) -> dict:
+    db = session_factory()
+    try:
+        closed = crud.close_out_before(db)
+    finally:
+        db.close()
+    for (company_id, service_date), count in closed.items():
+        logger.info("rollover closed %d tables of company %s for %s", count, company_id, service_date)
+    return closed
+
+
+async def rollover_loop(session_factory: Callable[[], Session], interval: float):
+    while True:
+        try:
+            await run_in_threadpool(run_rollover, session_factory)
+        except Exception:
+            logger.exception("service rollover failed")
+        await asyncio.sleep(interval)
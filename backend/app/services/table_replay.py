@@ -0,0 +1,209 @@
+# backend/app/services/table_replay.py
+"""
+Point-in-time reconstruction of service tables from the event log.
+
+A table's state at `ts` is its latest snapshot taken at or before `ts`
+(service_table_snapshots, written by crud every SNAPSHOT_EVERY versions)
+with the events after the snapshot and up to `ts` replayed on top. Tables
+without a snapshot replay from their creation event, and days that were
+already archived are replayed from the archive file.
+
+States are plain dicts (see table_state()) so snapshots, replay and the API
+response share one shape.
+"""
+import copy
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.service import ServiceStepEvent, ServiceTableSnapshot, StepEventType, TableStatus, WineKind
+from app.services import event_archive
+
+# a table gets a snapshot whenever its version is a multiple of this
+SNAPSHOT_EVERY = 25
+
+TABLE_FIELDS = ("table_number", "turn", "location", "status", "guest_count", "notes")
+GUEST_FIELDS = ("name", "allergy", "protein_sub", "doneness", "substitutions", "notes")
+WINE_FIELDS = ("kind", "wine_id", "label", "quantity")
+
+
+def _iso(dt: Optional[datetime]) -> Optional[str]:
+    return dt.isoformat() if dt else None
+
+
+def table_state(table) -> dict:
+    """Replayable state of a ServiceTable (with guests and wines loaded)."""
+    return {
+        "table_id": table.id,
+        "table_number": table.table_number,
+        "turn": table.turn,
+        "location": table.location,
+        "status": TableStatus(table.status).value,
+        "guest_count": table.guest_count,
+        "notes": table.notes,
+        "step_index": table.step_index,
+        "undo_depth": table.undo_depth or 0,
+        "redo_depth": table.redo_depth or 0,
+        "arrived_at": _iso(table.arrived_at),
+        "seated_at": _iso(table.seated_at),
+        "completed_at": _iso(table.completed_at),
+        "guests": [dict({f: getattr(g, f) for f in GUEST_FIELDS}, id=g.id) for g in table.guests],
+        "wines": [
+            dict({f: getattr(w, f) for f in WINE_FIELDS}, id=w.id, kind=WineKind(w.kind).value, quantity=float(w.quantity))
+            for w in table.wines
+        ],
+    }
+
+
+def _initial_state(table_id: str) -> dict:
+    return {
+        "table_id": table_id,
+        "table_number": None,
+        "turn": 1,
+        "location": None,
+        "status": TableStatus.OPEN.value,
+        "guest_count": 0,
+        "notes": None,
+        "step_index": 0,
+        "undo_depth": 0,
+        "redo_depth": 0,
+        "arrived_at": None,
+        "seated_at": None,
+        "completed_at": None,
+        "guests": [],
+        "wines": [],
+    }
+
+
+def _find(items: List[dict], item_id: Optional[str]) -> Optional[dict]:
+    return next((i for i in items if i["id"] == item_id), None)
+
+
+def apply_event(state: dict, event_type: str, to_step: Optional[int], payload: Optional[dict], created_at: str):
+    payload = payload or {}
+    values = payload.get("values") or {}
+
+    if event_type in (StepEventType.NEXT, StepEventType.REDO):
+        state["step_index"] = to_step
+        state["undo_depth"] += 1
+        state["redo_depth"] = 0 if event_type == StepEventType.NEXT else max(state["redo_depth"] - 1, 0)
+    elif event_type == StepEventType.UNDO:
+        state["step_index"] = to_step
+        state["undo_depth"] = max(state["undo_depth"] - 1, 0)
+        state["redo_depth"] += 1
+    elif event_type == StepEventType.ARRIVE:
+        state["arrived_at"] = state["arrived_at"] or created_at
+    elif event_type == StepEventType.SEAT:
+        state["seated_at"] = state["seated_at"] or created_at
+    elif event_type == StepEventType.COMPLETE:
+        state["status"] = TableStatus.COMPLETED.value
+        state["completed_at"] = state["completed_at"] or created_at
+    elif event_type == StepEventType.UPDATE:
+        if payload.get("wine_entry_id"):
+            wine = _find(state["wines"], payload["wine_entry_id"])
+            if wine is not None:
+                wine.update({k: v for k, v in values.items() if k in WINE_FIELDS})
+        else:
+            state.update({k: v for k, v in values.items() if k in TABLE_FIELDS})
+    elif event_type == StepEventType.GUEST_ADD:
+        state["guests"].append(dict({f: values.get(f) for f in GUEST_FIELDS}, id=payload["guest_id"]))
+    elif event_type == StepEventType.GUEST_UPDATE:
+        guest = _find(state["guests"], payload.get("guest_id"))
+        if guest is not None:
+            guest.update({k: v for k, v in values.items() if k in GUEST_FIELDS})
+    elif event_type == StepEventType.GUEST_REMOVE:
+        state["guests"] = [g for g in state["guests"] if g["id"] != payload.get("guest_id")]
+    elif event_type == StepEventType.WINE_ADD:
+        entry = payload.get("wine_entry") or {}
+        state["wines"].append(dict({f: entry.get(f) for f in WINE_FIELDS}, id=payload["wine_entry_id"]))
+    elif event_type == StepEventType.WINE_REMOVE:
+        state["wines"] = [w for w in state["wines"] if w["id"] != payload.get("wine_entry_id")]
+
+
+def _live_events(db: Session, company_id: int, service_date: date, ts: datetime, table_ids: Optional[List[str]]):
+    q = db.query(
+        ServiceStepEvent.id,
+        ServiceStepEvent.table_id,
+        ServiceStepEvent.event_type,
+        ServiceStepEvent.to_step,
+        ServiceStepEvent.payload,
+        ServiceStepEvent.created_at,
+    ).filter(
+        ServiceStepEvent.company_id == company_id,
+        ServiceStepEvent.service_date == service_date,
+        ServiceStepEvent.created_at <= ts,
+    )
+    if table_ids is not None:
+        q = q.filter(ServiceStepEvent.table_id.in_(table_ids))
+    return [(r.created_at.isoformat(), r.id, r.table_id, r.event_type, r.to_step, r.payload) for r in q]
+
+
+def _archived_events(company_id: int, service_date: date, ts: datetime, table_ids: Optional[List[str]]):
+    cutoff = ts.isoformat()
+    wanted = set(table_ids) if table_ids is not None else None
+    return [
+        (r["created_at"], r["id"], r["table_id"], r["event_type"], r["to_step"], r["payload"])
+        for r in event_archive.read_archive(company_id, service_date)
+        if r["created_at"] <= cutoff and (wanted is None or r["table_id"] in wanted)
+    ]
+
+
+def _latest_snapshots(
+    db: Session, company_id: int, service_date: date, ts: datetime, table_ids: Optional[List[str]]
+) -> Dict[str, ServiceTableSnapshot]:
+    q = db.query(ServiceTableSnapshot).filter(
+        ServiceTableSnapshot.company_id == company_id,
+        ServiceTableSnapshot.service_date == service_date,
+        ServiceTableSnapshot.taken_at <= ts,
+    )
+    if table_ids is not None:
+        q = q.filter(ServiceTableSnapshot.table_id.in_(table_ids))
+    latest: Dict[str, ServiceTableSnapshot] = {}
+    for snap in q:
+        if snap.table_id not in latest or snap.taken_at > latest[snap.table_id].taken_at:
+            latest[snap.table_id] = snap
+    return latest
+
+
+def replay_day(
+    db: Session,
+    company_id: int,
+    service_date: date,
+    ts: datetime,
+    table_ids: Optional[Iterable[str]] = None,
+) -> Dict[str, dict]:
+    """State of every table of a service day (or just `table_ids`) as of `ts`, keyed by table id."""
+    table_ids = list(table_ids) if table_ids is not None else None
+    snapshots = _latest_snapshots(db, company_id, service_date, ts, table_ids)
+
+    # an event can be in both places if archiving was interrupted; the id dedupes it
+    events = {ev[1]: ev for ev in _archived_events(company_id, service_date, ts, table_ids)}
+    events.update((ev[1], ev) for ev in _live_events(db, company_id, service_date, ts, table_ids))
+
+    states: Dict[str, dict] = {}
+    since: Dict[str, str] = {}
+    for table_id, snap in snapshots.items():
+        states[table_id] = copy.deepcopy(snap.state)
+        since[table_id] = snap.taken_at.isoformat()
+
+    by_table = defaultdict(list)
+    for ev in sorted(events.values()):
+        by_table[ev[2]].append(ev)
+
+    for table_id, table_events in by_table.items():
+        cutoff = since.get(table_id)
+        state = states.get(table_id)
+        for created_at, _id, _table_id, event_type, to_step, payload in table_events:
+            if cutoff is not None and created_at <= cutoff:
+                continue
+            if state is None:
+                state = states[table_id] = _initial_state(table_id)
+            apply_event(state, event_type, to_step, payload, created_at)
+    return states
+
+
+def replay_table(db: Session, company_id: int, service_date: date, table_id: str, ts: datetime) -> Optional[dict]:
+    """State of one table as of `ts`, or None if it didn't exist yet."""
+    return replay_day(db, company_id, service_date, ts, table_ids=[table_id]).get(table_id)
@@ -1,6 +1,6 @@
 from fastapi.testclient import TestClient
 from app.main import app
-from app.database import SessionLocal, Base, engine
+from app.db import Base, SessionLocal, database
 from app.models import User, Wine
 import pytest
 
@@ -9,8 +9,8 @@ client = TestClient(app)
 # Setup the test database (runs once)
 @pytest.fixture(scope="module", autouse=True)
 def setup_database():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.drop_all(bind=database.engine)
+    Base.metadata.create_all(bind=database.engine)
     db = SessionLocal()
     db.add(Wine(name="Test Wine", vintage=2020, varietal="Cabernet", region="Napa", price=25.0, stock=10))
     db.commit()
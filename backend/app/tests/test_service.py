@@ -0,0 +1,1238 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import create_engine, event, exc, inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.auth import ALGORITHM, SECRET_KEY, create_access_token, decode_token
+from app.core.db_pool import TimedQueuePool, pool_stats
+from app.core.principals import Principal, PrincipalCache, principal_cache, principal_claims
+from app.core import security
+from app.core.sqlite import SQLiteWriter, apply_pragmas, begin_immediate
+from app.core.token_cache import TokenCache, verified_tokens
+from app.main import app
+from app.crud import service as crud
+from app.crud import service_async as crud_async
+from app.db import Base, Database, database
+from app.db.upgrades import (
+    add_company_service_day,
+    add_missing_indexes,
+    add_table_version,
+    add_undo_redo_depth,
+    scope_step_events,
+)
+from app.models.company import Company
+from app.models.service import ServiceStepEvent, ServiceTable, ServiceTableSnapshot
+from app.models.user import User
+from app.routes import auth as auth_routes
+from app.routes.auth import get_current_user
+from app.services import event_archive
+from app.services.event_bus import EventBus, ServiceEvent, event_bus
+from app.services.event_journal import EventJournal, event_journal
+
+# routes run on the async engine, fixtures and direct crud calls on the sync one;
+# both open the same file so they see each other's commits. The default profile
+# keeps writes on the async engine, so there is no writer thread to manage.
+TEST_DB = os.path.join(tempfile.mkdtemp(), "service.db")
+# TestClient runs each request on its own event loop; pooled aiosqlite connections can't follow
+database.configure(f"sqlite:///{TEST_DB}", sqlite_profile="default", async_poolclass=NullPool)
+engine = database.engine
+async_engine = database.async_engine
+TestingSessionLocal = database.SessionLocal
+
+_statements = []
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    _statements.append(statement)
+
+
+def _no_fsync(dbapi_conn, record):
+    # throwaway database; don't pay for durability on every schema reset
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.close()
+
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "before_cursor_execute", _record_statement)
+    event.listen(_engine, "connect", _no_fsync)
+
+
+@contextmanager
+def count_queries():
+    start = len(_statements)
+    counter = {}
+    yield counter
+    counter["statements"] = _statements[start:]
+    counter["count"] = len(counter["statements"])
+    counter["selects"] = sum(1 for s in counter["statements"] if s.lstrip().upper().startswith("SELECT"))
+
+
+def override_current_user():
+    return Principal(id=1, username="manager", role="manager", company_id=1)
+
+
+@pytest.fixture()
+def client():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    # cutoff 0: the service day is the UTC date, whatever time the suite runs
+    db.add(Company(id=1, name="Test Co", service_day_cutoff_hour=0))
+    db.commit()
+    db.close()
+    crud._service_day_settings.clear()
+    principal_cache.clear()
+    verified_tokens.clear()
+
+    app.dependency_overrides[get_current_user] = override_current_user
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture()
+def table(client):
+    r = client.post("/api/service/tables", json={"table_number": "14", "turn": 1, "guest_count": 2})
+    assert r.status_code == 200
+    return r.json()
+
+
+def seed_detail(client, table_id):
+    client.post(f"/api/service/tables/{table_id}/arrive")
+    g = client.post(f"/api/service/tables/{table_id}/guests", json={"name": "Ann"}).json()["guests"][0]
+    client.post(f"/api/service/tables/{table_id}/guests", json={"name": "Bob"})
+    w = client.post(
+        f"/api/service/tables/{table_id}/wines",
+        json={"kind": "bottle", "label": "Barolo 2016", "quantity": 1},
+    ).json()["wines"][0]
+    return g["id"], w["id"]
+
+
+def test_get_table_detail_loads_guests_and_wines_in_two_selects(client, table):
+    seed_detail(client, table["id"])
+
+    with count_queries() as q:
+        r = client.get(f"/api/service/tables/{table['id']}")
+
+    assert r.status_code == 200
+    body = r.json()
+    assert len(body["guests"]) == 2
+    assert len(body["wines"]) == 1
+    assert q["selects"] <= 2
+
+
+@pytest.mark.parametrize(
+    "method,path,payload",
+    [
+        ("patch", "", {"notes": "birthday"}),
+        ("post", "/arrive", None),
+        ("post", "/seat", None),
+        ("post", "/complete", None),
+        ("post", "/guests", {"name": "Cy"}),
+        ("patch", "/guests/{guest_id}", {"allergy": "nuts"}),
+        ("delete", "/guests/{guest_id}", None),
+        ("post", "/wines", {"kind": "btg", "label": "Chablis", "quantity": 2}),
+        ("patch", "/wines/{wine_id}", {"quantity": 2}),
+        ("delete", "/wines/{wine_id}", None),
+    ],
+)
+def test_detail_mutations_do_not_lazy_load(client, table, method, path, payload):
+    guest_id, wine_id = seed_detail(client, table["id"])
+    url = f"/api/service/tables/{table['id']}" + path.format(guest_id=guest_id, wine_id=wine_id)
+
+    kwargs = {"json": payload} if payload is not None else {}
+    with count_queries() as q:
+        r = getattr(client, method)(url, **kwargs)
+
+    assert r.status_code == 200, r.text
+    assert "guests" in r.json() and "wines" in r.json()
+    # only the initial detail load; the response is built from session state
+    assert q["selects"] <= 2
+
+
+def test_create_table_returns_detail(client):
+    client.get("/api/service/tables")  # warms the company's service-day settings
+    with count_queries() as q:
+        r = client.post("/api/service/tables", json={"table_number": "7", "turn": 2})
+
+    assert r.status_code == 200
+    assert r.json()["guests"] == [] and r.json()["wines"] == []
+    assert q["selects"] == 0
+
+
+def test_next_step_is_a_single_update(client, table):
+    with count_queries() as q:
+        r = client.post(f"/api/service/tables/{table['id']}/next")
+
+    assert r.status_code == 200
+    assert r.json()["step_index"] == 1
+    assert q["selects"] == 0
+    updates = [s for s in q["statements"] if s.lstrip().upper().startswith("UPDATE")]
+    assert len(updates) == 1 and "step_index + " in updates[0] and "RETURNING" in updates[0]
+
+
+def test_step_taps_from_two_sessions_both_apply(client, table):
+    # two devices that read the table at the same step: neither tap is lost
+    db1, db2 = TestingSessionLocal(), TestingSessionLocal()
+    try:
+        crud.advance_step(db1, table["id"], 1, actor_user_id=1)
+        row = crud.advance_step(db2, table["id"], 1, actor_user_id=2)
+    finally:
+        db1.close()
+        db2.close()
+    assert row.step_index == 2
+    assert row.version == table["version"] + 2
+
+
+def test_undo_step_stops_at_zero_and_404s(client, table):
+    r = client.post(f"/api/service/tables/{table['id']}/undo")
+    assert r.status_code == 200
+    assert r.json()["step_index"] == 0
+    assert r.json()["version"] == table["version"]
+
+    client.post(f"/api/service/tables/{table['id']}/next")
+    r = client.post(f"/api/service/tables/{table['id']}/undo", headers={"If-Match": '"v1"'})
+    assert r.status_code == 412
+
+    r = client.post(f"/api/service/tables/{table['id']}/undo")
+    assert r.json()["step_index"] == 0
+
+    assert client.post("/api/service/tables/missing/next").status_code == 404
+
+
+def test_multi_level_undo_and_redo_skip_the_event_log(client, table):
+    url = f"/api/service/tables/{table['id']}"
+    for _ in range(3):
+        client.post(f"{url}/next")
+    client.patch(url, json={"notes": "window seat"})
+
+    with count_queries() as q:
+        r = client.post(f"{url}/undo")
+    assert not any("service_step_events" in s for s in q["statements"] if s.lstrip().upper().startswith("SELECT"))
+    r = client.post(f"{url}/undo")
+    assert (r.json()["step_index"], r.json()["undo_depth"], r.json()["redo_depth"]) == (1, 1, 2)
+
+    r = client.post(f"{url}/redo")
+    assert (r.json()["step_index"], r.json()["undo_depth"], r.json()["redo_depth"]) == (2, 2, 1)
+
+    # a new step clears what was left to redo
+    client.post(f"{url}/next")
+    r = client.post(f"{url}/redo")
+    assert (r.json()["step_index"], r.json()["redo_depth"]) == (3, 0)
+
+    r = client.post(f"{url}/batch", json={"ops": [{"op": "undo"}, {"op": "undo"}, {"op": "redo"}]})
+    assert r.status_code == 200, r.text
+    assert r.json()["step_index"] == 2
+
+
+def test_mutation_response_reflects_session_state(client, table):
+    guest_id, wine_id = seed_detail(client, table["id"])
+
+    r = client.delete(f"/api/service/tables/{table['id']}/guests/{guest_id}")
+    assert [g["name"] for g in r.json()["guests"]] == ["Bob"]
+
+    r = client.patch(f"/api/service/tables/{table['id']}/wines/{wine_id}", json={"quantity": 3})
+    assert r.json()["wines"][0]["quantity"] == 3
+
+    fresh = client.get(f"/api/service/tables/{table['id']}").json()
+    assert fresh["guests"] == r.json()["guests"]
+    assert fresh["updated_at"] == r.json()["updated_at"]
+
+
+def test_batch_applies_ops_in_one_commit(client, table):
+    ops = [
+        {"op": "arrive"},
+        {"op": "seat"},
+        {"op": "next"},
+        {"op": "next"},
+        {"op": "undo"},
+        {"op": "guest_add", "data": {"name": "Ann"}},
+        {"op": "guest_add", "data": {"name": "Bob"}},
+        {"op": "guest_add", "data": {"name": "Cy"}},
+        {"op": "wine_add", "data": {"kind": "bottle", "label": "Barolo 2016"}},
+        {"op": "patch", "data": {"notes": "anniversary"}},
+    ]
+    with count_queries() as q:
+        r = client.post(f"/api/service/tables/{table['id']}/batch", json={"ops": ops})
+
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["step_index"] == 1
+    assert body["arrived_at"] and body["seated_at"]
+    assert sorted(g["name"] for g in body["guests"]) == ["Ann", "Bob", "Cy"]
+    assert body["wines"][0]["label"] == "Barolo 2016"
+    assert body["notes"] == "anniversary"
+
+    event_inserts = [s for s in q["statements"] if s.startswith("INSERT INTO service_step_events")]
+    assert len(event_inserts) == 1
+    assert sum(1 for s in q["statements"] if s.startswith("UPDATE service_tables")) == 1
+
+
+def test_batch_rolls_back_on_failing_op(client, table):
+    ops = [
+        {"op": "next"},
+        {"op": "guest_remove", "guest_id": "missing"},
+    ]
+    r = client.post(f"/api/service/tables/{table['id']}/batch", json={"ops": ops})
+    assert r.status_code == 404
+    assert "ops[1]" in r.json()["detail"]
+
+    ops = [{"op": "wine_add", "data": {"kind": "btg", "label": "Chablis"}}]
+    r = client.post(f"/api/service/tables/{table['id']}/batch", json={"ops": ops})
+    assert r.status_code == 409
+
+    assert client.get(f"/api/service/tables/{table['id']}").json()["step_index"] == 0
+
+
+def test_bulk_create_reports_conflicts_per_row(client, table):
+    floor = [
+        {"table_number": "1", "turn": 1, "location": "patio", "guest_count": 4},
+        {"table_number": "1", "turn": 2, "guest_count": 2},
+        {"table_number": "14", "turn": 1},  # already created by the fixture
+        {"table_number": "2", "turn": 3},
+        {"table_number": "1", "turn": 1},
+    ]
+    with count_queries() as q:
+        r = client.post("/api/service/tables/bulk", json={"tables": floor})
+
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert [(t["table_number"], t["turn"]) for t in body["created"]] == [("1", 1), ("1", 2)]
+    assert body["created"][0]["location"] == "patio"
+    assert [c["index"] for c in body["conflicts"]] == [2, 3, 4]
+
+    inserts = [s for s in q["statements"] if s.startswith("INSERT")]
+    assert len(inserts) == 2  # one executemany for tables, one for their events
+
+    listed = client.get("/api/service/tables").json()
+    assert listed["total"] == 3
+
+
+def test_list_tables_keyset_pagination(client):
+    floor = [{"table_number": str(i)} for i in range(5)]
+    client.post("/api/service/tables/bulk", json={"tables": floor})
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "include_total": False}
+        if cursor:
+            params["cursor"] = cursor
+        with count_queries() as q:
+            body = client.get("/api/service/tables", params=params).json()
+        assert body["total"] is None
+        assert not any("count(" in s.lower() for s in q["statements"])
+        seen += [t["id"] for t in body["items"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(seen) == len(set(seen)) == 5
+    assert client.get("/api/service/tables", params={"cursor": "nope"}).status_code == 400
+
+
+def test_changes_feed_returns_deltas_and_tombstones(client, table, monkeypatch):
+    monkeypatch.setattr(crud, "SYNC_OVERLAP", timedelta(0))
+    guest_id, wine_id = seed_detail(client, table["id"])
+    other = client.post("/api/service/tables", json={"table_number": "20"}).json()
+
+    snap = client.get("/api/service/changes").json()
+    assert {t["id"] for t in snap["tables"]} == {table["id"], other["id"]}
+    assert len(snap["guests"]) == 2 and len(snap["wines"]) == 1
+    assert snap["deleted_guests"] == [] and snap["deleted_wines"] == []
+
+    client.delete(f"/api/service/tables/{table['id']}/guests/{guest_id}")
+    client.delete(f"/api/service/tables/{table['id']}/wines/{wine_id}")
+
+    delta = client.get("/api/service/changes", params={"cursor": snap["next_cursor"]}).json()
+    assert [t["id"] for t in delta["tables"]] == [table["id"]]
+    assert delta["guests"] == [] and delta["wines"] == []
+    assert [g["id"] for g in delta["deleted_guests"]] == [guest_id]
+    assert [w["id"] for w in delta["deleted_wines"]] == [wine_id]
+
+    idle = client.get("/api/service/changes", params={"cursor": delta["next_cursor"]}).json()
+    assert idle["tables"] == [] and idle["deleted_guests"] == []
+
+
+def test_floor_stream_publishes_commits_and_resumes(client, table):
+    from app.services.floor_stream import floor_stream
+
+    company_id = 1
+
+    async def scenario():
+        sub = floor_stream.subscribe(company_id)
+        await asyncio.to_thread(client.post, f"/api/service/tables/{table['id']}/next")
+        await asyncio.to_thread(client.post, f"/api/service/tables/{table['id']}/guests", json={"name": "Ann"})
+        first = await asyncio.wait_for(sub.get(), 1)
+        second = await asyncio.wait_for(sub.get(), 1)
+        sub.close()
+
+        resumed = floor_stream.subscribe(company_id, last_event_id=first["id"])
+        resumed.close()
+        stale = floor_stream.subscribe(company_id, last_event_id="other-1")
+        stale.close()
+        return first, second, resumed, stale
+
+    first, second, resumed, stale = asyncio.run(scenario())
+
+    assert first["table_id"] == table["id"]
+    assert first["step_index"] == 1 and first["changed"] == ["table"]
+    assert second["changed"] == ["guest"] and second["events"] == ["guest_add"]
+    assert [e["id"] for e in resumed.backlog] == [second["id"]] and not resumed.reset
+    assert stale.reset
+
+
+def test_floor_stream_skips_subscribers_whose_loop_closed():
+    from app.services.floor_stream import FloorChangeStream
+
+    stream = FloorChangeStream()
+
+    async def subscribe():
+        return stream.subscribe(1)
+
+    orphan = asyncio.run(subscribe())
+
+    async def scenario():
+        sub = stream.subscribe(1)
+        stream.publish(1, {"table_id": "t"})
+        return await asyncio.wait_for(sub.get(), 1)
+
+    assert asyncio.run(scenario())["table_id"] == "t"
+    assert orphan not in stream._subscribers[1]
+
+
+def test_websocket_step_commands_ack_and_fan_out(client, table):
+    db = TestingSessionLocal()
+    db.add(User(id=7, username="expo1", email="expo1@example.com", hashed_password="x", role="expo", company_id=1))
+    db.commit()
+    db.close()
+    token = create_access_token({"sub": "expo1"})
+
+    with client.websocket_connect(f"/api/service/ws?token={token}") as ws, client.websocket_connect(
+        f"/api/service/ws?token={token}"
+    ) as other:
+        ws.send_json({"cmd": "next", "table_id": table["id"], "ref": "a1"})
+        msgs = [ws.receive_json(), ws.receive_json()]
+        ack = next(m for m in msgs if m["type"] == "ack")
+        assert ack["ref"] == "a1" and ack["table_id"] == table["id"] and ack["step_index"] == 1
+
+        change = other.receive_json()
+        assert change["type"] == "change" and change["step_index"] == 1
+
+        ws.send_json({"cmd": "undo", "table_id": "missing", "ref": "a2"})
+        assert ws.receive_json() == {"type": "error", "ref": "a2", "status": 404, "detail": "Table not found"}
+
+    assert client.get(f"/api/service/tables/{table['id']}").json()["step_index"] == 1
+
+
+def test_websocket_rejects_non_integer_versions_and_forwards_resets(client, table):
+    from app.services.floor_stream import floor_stream
+
+    db = TestingSessionLocal()
+    db.add(User(id=7, username="expo1", email="expo1@example.com", hashed_password="x", role="expo", company_id=1))
+    db.commit()
+    db.close()
+    token = create_access_token({"sub": "expo1"})
+
+    with client.websocket_connect(f"/api/service/ws?token={token}") as ws:
+        for version in ("1", True, 1.0, [1]):
+            ws.send_json({"cmd": "next", "table_id": table["id"], "ref": "v", "version": version})
+            error = ws.receive_json()
+            assert (error["type"], error["status"], error["detail"]) == ("error", 400, "version must be an integer")
+
+        # as if this client's queue had overflowed
+        for sub in floor_stream._subscribers[1]:
+            sub.reset = True
+        client.post(f"/api/service/tables/{table['id']}/next")
+        assert ws.receive_json() == {"type": "reset"}
+        assert ws.receive_json()["type"] == "change"
+
+    assert client.get(f"/api/service/tables/{table['id']}").json()["step_index"] == 1
+
+
+def test_websocket_rejects_bad_token(client):
+    from starlette.websockets import WebSocketDisconnect
+
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/api/service/ws?token=nope") as ws:
+            ws.receive_json()
+    assert exc.value.code == 1008
+
+
+def test_token_claims_authorize_without_a_user_lookup(client):
+    db = TestingSessionLocal()
+    user = User(id=8, username="expo2", email="expo2@example.com", hashed_password="x", role="expo", company_id=1)
+    db.add(user)
+    db.add(User(id=9, username="expo3", email="expo3@example.com", hashed_password="x", role="expo", company_id=1))
+    db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token(principal_claims(user))}"}
+    legacy = {"Authorization": f"Bearer {create_access_token({'sub': 'expo3'})}"}
+    del app.dependency_overrides[get_current_user]
+
+    def users_selects(q):
+        return sum(1 for st in q["statements"] if "FROM users" in st)
+
+    with count_queries() as q:
+        assert client.get("/api/service/tables", headers=headers).status_code == 200
+        assert client.get("/api/service/tables", headers=headers).status_code == 200
+    assert users_selects(q) == 0
+
+    # tokens without role/company claims are looked up once, then cached
+    with count_queries() as q:
+        assert client.get("/api/service/tables", headers=legacy).status_code == 200
+        assert client.get("/api/service/tables", headers=legacy).status_code == 200
+    assert users_selects(q) == 1
+
+    # a company change invalidates the cache and the claims of older tokens
+    user.company_id = None
+    db.commit()
+    db.close()
+    with count_queries() as q:
+        r = client.get("/api/service/tables", headers=headers)
+    assert r.status_code == 403 and r.json()["detail"] == "User is not assigned to a company"
+    assert users_selects(q) == 1
+
+
+def test_other_workers_recheck_old_claims_against_users(client, monkeypatch):
+    db = TestingSessionLocal()
+    user = User(id=10, username="expo4", email="expo4@example.com", hashed_password="x", role="expo", company_id=1)
+    db.add(user)
+    db.commit()
+    claims = principal_claims(user)
+    db.close()
+    now = int(datetime.now(timezone.utc).timestamp())
+    young = jwt.encode({**claims, "iat": now, "exp": now + 3600}, SECRET_KEY, algorithm=ALGORITHM)
+    old = jwt.encode({**claims, "iat": now - 120, "exp": now + 3600}, SECRET_KEY, algorithm=ALGORITHM)
+    del app.dependency_overrides[get_current_user]
+
+    # the user is moved by another worker: no ORM event reaches this one
+    with engine.begin() as conn:
+        conn.execute(User.__table__.update().where(User.__table__.c.id == 10).values(company_id=None))
+    monkeypatch.setattr(auth_routes, "principal_cache", PrincipalCache(ttl_seconds=60, max_entries=100))
+
+    # claims younger than the TTL are trusted, older ones are checked against users
+    assert client.get("/api/service/tables", headers={"Authorization": f"Bearer {young}"}).status_code == 200
+    r = client.get("/api/service/tables", headers={"Authorization": f"Bearer {old}"})
+    assert r.status_code == 403 and r.json()["detail"] == "User is not assigned to a company"
+
+
+def test_verified_tokens_are_cached_until_they_expire(client):
+    token = create_access_token({"sub": "expo2"})
+    assert decode_token(token)["sub"] == "expo2"
+    assert decode_token(token)["sub"] == "expo2"
+    assert decode_token("nope") is None and decode_token("nope") is None
+    stats = verified_tokens.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 3)
+    assert client.get("/api/service/auth/cache").json()["tokens"]["hits"] == 1
+
+    # past its exp a cached token is verified again, and rejected
+    expired = create_access_token({"sub": "expo2"}, expires_delta=timedelta(seconds=-1))
+    verified_tokens.put("app.auth", expired, {"sub": "expo2", "exp": datetime.now(timezone.utc).timestamp() - 1})
+    assert decode_token(expired) is None
+
+    # both token modules share the cache, each under its own secret
+    other = security.create_access_token(5)
+    assert security.decode_token(other)["sub"] == "5"
+    assert decode_token(other) is None
+
+    lru = TokenCache(2)
+    lru.put("s", "a", {"sub": "a"})
+    lru.put("s", "b", {"sub": "b"})
+    assert lru.get("s", "a") is not None
+    lru.put("s", "c", {"sub": "c"})
+    assert lru.get("s", "b") is None and lru.get("s", "a") == {"sub": "a"}
+
+
+def test_event_bus_delivers_typed_events_after_commit(client, table):
+    received = []
+    sub = event_bus.subscribe(received.append, name="test")
+    try:
+        r = client.post(f"/api/service/tables/{table['id']}/guests", json={"name": "Ann"})
+        client.post(f"/api/service/tables/{table['id']}/next")
+        sub.join()
+    finally:
+        sub.close()
+
+    guest_add, step = received
+    (ev,) = guest_add
+    assert isinstance(ev, ServiceEvent)
+    assert ev.company_id == 1 and ev.table_id == table["id"]
+    assert ev.event_type == "guest_add" and ev.guest_id == r.json()["guests"][0]["id"]
+    assert (step[0].event_type, step[0].from_step, step[0].to_step) == ("next", 0, 1)
+
+
+def test_subscriber_with_a_closed_loop_does_not_fail_the_commit(client, table):
+    async def subscribe():
+        return event_bus.subscribe_async(name="gone")
+
+    # the subscriber's loop ends without closing the subscription
+    orphan = asyncio.run(subscribe())
+    r = client.post(f"/api/service/tables/{table['id']}/next")
+    assert r.status_code == 200
+    assert orphan.dropped == 1
+    assert "gone" not in [s["name"] for s in event_bus.stats()["subscribers"]]
+
+
+def test_event_bus_drops_instead_of_blocking():
+    bus = EventBus()
+    gate = threading.Event()
+    slow = bus.subscribe(lambda batch: gate.wait(), name="slow", maxsize=1)
+    ev = ServiceEvent(company_id=1, table_id="t", event_type="next")
+
+    for _ in range(5):
+        bus.publish([ev])
+    gate.set()
+    slow.join()
+
+    stats = bus.stats()
+    assert stats["published"] == 5
+    (s,) = stats["subscribers"]
+    assert s["dropped"] >= 3 and s["delivered"] + s["dropped"] == 5
+    slow.close()
+
+    async def scenario():
+        sub = bus.subscribe_async(maxsize=1)
+        bus.publish([ev])
+        bus.publish([ev])
+        await asyncio.sleep(0)
+        batch = await sub.get()
+        sub.close()
+        return batch, sub.dropped
+
+    batch, dropped = asyncio.run(scenario())
+    assert batch == (ev,) and dropped == 1
+
+
+def test_conditional_get_on_table_detail(client, table):
+    url = f"/api/service/tables/{table['id']}"
+    r = client.get(url)
+    etag = r.headers["etag"]
+
+    with count_queries() as q:
+        r = client.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.headers["etag"] == etag
+    assert q["selects"] == 1
+    assert "service_guests" not in " ".join(q["statements"])
+
+    client.post(f"{url}/guests", json={"name": "Ann"})
+    r = client.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+
+
+def test_conditional_get_on_table_list(client, table):
+    r = client.get("/api/service/tables")
+    etag = r.headers["etag"]
+
+    assert client.get("/api/service/tables", headers={"If-None-Match": etag}).status_code == 304
+    # different filters, different representation
+    assert client.get("/api/service/tables", params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 200
+
+    client.post(f"/api/service/tables/{table['id']}/complete")
+    r = client.get("/api/service/tables", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json()["items"] == []
+
+
+def test_if_match_rejects_stale_writes(client, table):
+    url = f"/api/service/tables/{table['id']}"
+    assert table["version"] == 1
+
+    r = client.patch(url, json={"notes": "vip"}, headers={"If-Match": '"v1"'})
+    assert r.status_code == 200 and r.json()["version"] == 2
+
+    r = client.post(f"{url}/guests", json={"name": "Ann"}, headers={"If-Match": '"v1"'})
+    assert r.status_code == 412
+
+    r = client.post(f"{url}/next", headers={"If-Match": client.get(url).headers["etag"]})
+    assert r.status_code == 200 and r.json()["version"] == 3
+
+
+def test_concurrent_write_loses_on_conditional_update(client, table):
+    expo, somm = TestingSessionLocal(), TestingSessionLocal()
+    try:
+        t_expo = crud.get_table_detail(expo, table["id"])
+        t_somm = crud.get_table_detail(somm, table["id"])
+
+        crud.next_step(expo, t_expo, actor_user_id=1)
+        with pytest.raises(crud.StaleTableError):
+            crud.add_guest(somm, t_somm, {"name": "Ann"}, actor_user_id=2)
+    finally:
+        expo.close()
+        somm.close()
+
+    body = client.get(f"/api/service/tables/{table['id']}").json()
+    assert body["step_index"] == 1 and body["guests"] == [] and body["version"] == 2
+
+
+def test_upgrade_backfills_undo_depth_of_tables_in_progress(client, table):
+    for _ in range(3):
+        client.post(f"/api/service/tables/{table['id']}/next")
+    # a database from before the depth counters
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE service_tables DROP COLUMN undo_depth")
+        conn.exec_driver_sql("ALTER TABLE service_tables DROP COLUMN redo_depth")
+
+    assert add_undo_redo_depth(engine) == 1
+    assert add_undo_redo_depth(engine) == 0
+
+    r = client.post(f"/api/service/tables/{table['id']}/undo")
+    assert r.status_code == 200
+    assert (r.json()["step_index"], r.json()["undo_depth"], r.json()["redo_depth"]) == (2, 2, 1)
+
+
+def test_upgrade_adds_version_to_existing_tables(client, table):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE service_tables DROP COLUMN version")
+
+    assert add_table_version(engine) is True
+    assert add_table_version(engine) is False
+
+    assert client.get(f"/api/service/tables/{table['id']}").json()["version"] == 1
+    r = client.post(f"/api/service/tables/{table['id']}/next", headers={"If-Match": '"v1"'})
+    assert r.status_code == 200 and r.json()["version"] == 2
+
+
+def test_upgrade_scopes_existing_step_events_to_their_day(client, table):
+    client.post(f"/api/service/tables/{table['id']}/next")
+    client.post(f"/api/service/tables/{table['id']}/arrive")
+    # a database from before events carried their company and day
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_service_step_events_company_day")
+        conn.exec_driver_sql("ALTER TABLE service_step_events DROP COLUMN company_id")
+        conn.exec_driver_sql("ALTER TABLE service_step_events DROP COLUMN service_date")
+
+    assert scope_step_events(engine) == 3
+    assert scope_step_events(engine) == 0
+    add_missing_indexes(engine)
+    add_missing_indexes(engine)
+    indexes = {ix["name"] for ix in inspect(engine).get_indexes("service_step_events")}
+    assert "ix_service_step_events_company_day" in indexes
+
+    r = client.get("/api/service/events", params={"service_date": table["service_date"], "table_id": table["id"]})
+    assert [e["event_type"] for e in r.json()] == ["update", "next", "arrive"]
+
+
+def test_upgrade_adds_service_day_settings_to_existing_companies(client):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE companies DROP COLUMN timezone")
+        conn.exec_driver_sql("ALTER TABLE companies DROP COLUMN service_day_cutoff_hour")
+
+    assert add_company_service_day(engine) is True
+    assert add_company_service_day(engine) is False
+
+    body = client.get("/api/companies/1").json()
+    assert (body["timezone"], body["service_day_cutoff_hour"]) == ("UTC", 4)
+
+
+def test_company_service_day_settings_are_validated_and_applied(client):
+    assert client.patch("/api/companies/1", json={"timezone": "Mars/Olympus_Mons"}).status_code == 422
+    assert client.patch("/api/companies/1", json={"service_day_cutoff_hour": 24}).status_code == 422
+    assert client.patch("/api/companies/2", json={"timezone": "UTC"}).status_code == 404
+
+    # a zone where it's already tomorrow for most of the UTC day, or still yesterday
+    now = datetime.now(timezone.utc)
+    tz = "Pacific/Kiritimati" if now.hour >= 10 else "Pacific/Pago_Pago"
+    client.get("/api/service/tables")  # caches the old settings
+    r = client.patch("/api/companies/1", json={"timezone": tz, "service_day_cutoff_hour": 0})
+    assert r.status_code == 200
+    assert (r.json()["name"], r.json()["timezone"]) == ("Test Co", tz)
+
+    r = client.post("/api/service/tables", json={"table_number": "12"})
+    assert r.status_code in (200, 201)
+    assert r.json()["service_date"] == crud.company_service_day(tz, 0).isoformat() != now.date().isoformat()
+
+
+def test_closed_day_is_archived_and_still_readable(client, table, tmp_path, monkeypatch):
+    monkeypatch.setattr(event_archive.settings, "EVENT_ARCHIVE_DIR", str(tmp_path))
+    client.post(f"/api/service/tables/{table['id']}/next")
+    client.post(f"/api/service/tables/{table['id']}/arrive")
+
+    yesterday = date.today() - timedelta(days=1)
+    db = TestingSessionLocal()
+    try:
+        db.query(ServiceStepEvent).update({ServiceStepEvent.service_date: yesterday})
+        db.commit()
+        with pytest.raises(ValueError):
+            event_archive.archive_day(db, 1, date.today())
+        assert event_archive.archive_closed_days(db) == {(1, yesterday): 3}
+        assert db.query(ServiceStepEvent).count() == 0
+    finally:
+        db.close()
+
+    assert (tmp_path / "1" / f"{yesterday.isoformat()}.ndjson.gz").exists()
+    r = client.get("/api/service/events", params={"service_date": yesterday.isoformat(), "table_id": table["id"]})
+    assert r.status_code == 200
+    assert [e["event_type"] for e in r.json()] == ["update", "next", "arrive"]
+    assert r.json()[0]["payload"]["created"] is True
+
+
+def test_open_night_is_not_archived_before_the_cutoff(client, table, tmp_path, monkeypatch):
+    monkeypatch.setattr(event_archive.settings, "EVENT_ARCHIVE_DIR", str(tmp_path))
+    client.post(f"/api/service/tables/{table['id']}/next")
+
+    # a cutoff hour after the current time: last night's service is still running
+    now = datetime.now(timezone.utc)
+    tz = "UTC" if now.hour < 23 else "Etc/GMT+1"
+    cutoff = now.astimezone(ZoneInfo(tz)).hour + 1
+    open_day = crud.company_service_day(tz, cutoff, now)
+    assert open_day < now.date()
+    db = TestingSessionLocal()
+    try:
+        db.query(Company).update({Company.timezone: tz, Company.service_day_cutoff_hour: cutoff})
+        db.query(ServiceStepEvent).update({ServiceStepEvent.service_date: open_day})
+        db.commit()
+        crud._service_day_settings.clear()
+
+        with pytest.raises(ValueError):
+            event_archive.archive_day(db, 1, open_day)
+        assert event_archive.archive_closed_days(db) == {}
+        assert db.query(ServiceStepEvent).count() == 2
+    finally:
+        db.close()
+    assert not (tmp_path / "1").exists()
+
+
+def test_event_payloads_are_json_and_searchable_in_sql(client, table):
+    guest_id, wine_id = seed_detail(client, table["id"])
+    client.delete(f"/api/service/tables/{table['id']}/wines/{wine_id}")
+
+    with count_queries() as q:
+        r = client.get("/api/service/events/search", params={"wine_entry_id": wine_id})
+    assert r.status_code == 200
+    assert [e["event_type"] for e in r.json()] == ["wine_remove", "wine_add"]
+    assert r.json()[0]["payload"]["wine_entry"]["label"] == "Barolo 2016"
+
+    # the filter is rendered with the key inline, so it hits the expression index
+    stmt = next(s for s in q["statements"] if "service_step_events" in s)
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + stmt, (1, wine_id, 200, 0)).all()
+    assert any("ix_service_step_events_wine_entry_id" in row[-1] for row in plan)
+
+    r = client.get("/api/service/events/search", params={"guest_id": guest_id, "event_type": "guest_add"})
+    assert [(e["payload"]["guest_id"], e["payload"]["values"]["name"]) for e in r.json()] == [(guest_id, "Ann")]
+
+
+def test_write_behind_journal_moves_event_inserts_off_the_request(client, table, tmp_path):
+    spool = tmp_path / "journal.ndjson"
+    writers = []
+
+    def record_writer(conn, cursor, statement, *args):
+        if statement.startswith("INSERT INTO service_step_events"):
+            writers.append(threading.current_thread().name)
+
+    event.listen(engine, "before_cursor_execute", record_writer)
+    event_journal.start(TestingSessionLocal, str(spool), flush_interval=0.05)
+    try:
+        r = client.post(f"/api/service/tables/{table['id']}/next")
+        client.post(f"/api/service/tables/{table['id']}/guests", json={"name": "Ann"})
+        assert r.status_code == 200
+
+        event_journal.flush()
+        assert writers and set(writers) == {"event-journal"}
+        stats = event_journal.stats()
+        assert stats["written"] == 2 and stats["queue_depth"] == 0
+        assert spool.read_text() == ""
+    finally:
+        event_journal.stop()
+        event.remove(engine, "before_cursor_execute", record_writer)
+
+    types = [e["event_type"] for e in client.get("/api/service/events/search", params={"table_id": table["id"]}).json()]
+    assert types == ["guest_add", "next", "update"]
+
+
+def test_changes_cursor_waits_for_a_failing_journal_flush(client, table, tmp_path, monkeypatch):
+    # no overlap at all: only the journal's high-water mark keeps the tombstone in view
+    monkeypatch.setattr(crud, "sync_overlap", lambda: timedelta(0))
+    guest_id, _ = seed_detail(client, table["id"])
+    cursor = client.get("/api/service/changes").json()["next_cursor"]
+
+    down = threading.Event()
+    down.set()
+
+    def flaky_session():
+        if down.is_set():
+            raise exc.OperationalError("INSERT", {}, Exception("database is locked"))
+        return TestingSessionLocal()
+
+    failures = event_journal.failures
+    event_journal.start(flaky_session, str(tmp_path / "journal.ndjson"), flush_interval=0.05)
+    try:
+        client.delete(f"/api/service/tables/{table['id']}/guests/{guest_id}")
+        while event_journal.failures == failures:
+            time.sleep(0.01)
+        during = client.get("/api/service/changes", params={"cursor": cursor}).json()
+        assert during["deleted_guests"] == []
+        down.clear()
+        event_journal.flush()
+    finally:
+        event_journal.stop()
+
+    after = client.get("/api/service/changes", params={"cursor": during["next_cursor"]}).json()
+    assert [g["id"] for g in after["deleted_guests"]] == [guest_id]
+
+
+def journal_rows(table, n, prefix="ev"):
+    service_date = date.fromisoformat(table["service_date"])
+    return [
+        {
+            "id": f"{prefix}-{i}",
+            "table_id": table["id"],
+            "company_id": 1,
+            "service_date": service_date,
+            "event_type": "seat",
+            "from_step": None,
+            "to_step": None,
+            "payload": None,
+            "actor_user_id": 1,
+            "created_at": datetime.utcnow(),
+        }
+        for i in range(n)
+    ]
+
+
+def test_journal_with_a_full_queue_keeps_flushing(client, table, tmp_path):
+    journal = EventJournal()
+    journal.start(TestingSessionLocal, str(tmp_path / "journal.ndjson"), queue_size=4, batch_size=2, flush_interval=0.01)
+    workers = [
+        threading.Thread(target=lambda n=n: [journal.append(journal_rows(table, 1, f"w{n}-{i}")) for i in range(20)])
+        for n in range(4)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(10)
+    try:
+        assert not any(w.is_alive() for w in workers)
+        assert journal.flush(10)
+        assert journal.written == 80 and journal.blocked > 0
+    finally:
+        journal.stop()
+
+
+def test_journal_append_on_the_event_loop_never_blocks_it(client, table, tmp_path):
+    gate = threading.Event()
+
+    def slow_session():
+        gate.wait()
+        return TestingSessionLocal()
+
+    journal = EventJournal()
+    journal.start(slow_session, str(tmp_path / "journal.ndjson"), queue_size=1, batch_size=1, flush_interval=0.01)
+
+    async def scenario():
+        started = time.perf_counter()
+        # the queue fills at once and the writer is stuck: only executor threads wait
+        journal.append(journal_rows(table, 5))
+        return time.perf_counter() - started, journal.pending_since()
+
+    # asyncio.run() waits for the executor on exit, so open the database again meanwhile
+    release = threading.Timer(0.5, gate.set)
+    release.start()
+    try:
+        elapsed, pending = asyncio.run(scenario())
+        assert elapsed < 0.2 and pending is not None
+    finally:
+        gate.set()
+        journal.stop()
+    assert journal.written == 5
+
+
+def test_journal_stop_gives_up_when_the_database_is_down(client, table, tmp_path):
+    spool = tmp_path / "journal.ndjson"
+
+    def down():
+        raise exc.OperationalError("INSERT", {}, Exception("unable to open database file"))
+
+    journal = EventJournal()
+    journal.start(down, str(spool), flush_interval=0.01)
+    journal.append(journal_rows(table, 2))
+    started = time.perf_counter()
+    journal.stop(timeout=0.2)
+    assert time.perf_counter() - started < 2
+    # left for recover() on the next start
+    assert len(spool.read_text().splitlines()) == 2
+
+
+def test_journal_inserts_rows_appended_after_stop(client, table, tmp_path):
+    journal = EventJournal()
+    journal.start(TestingSessionLocal, str(tmp_path / "journal.ndjson"))
+    journal.stop()
+    # staged while the journal ran, committed after it stopped
+    journal.append(
+        [
+            {
+                "id": "ev-late",
+                "table_id": table["id"],
+                "company_id": 1,
+                "service_date": date.fromisoformat(table["service_date"]),
+                "event_type": "seat",
+                "from_step": None,
+                "to_step": None,
+                "payload": None,
+                "actor_user_id": 1,
+                "created_at": datetime.utcnow(),
+            }
+        ]
+    )
+    r = client.get("/api/service/events/search", params={"event_type": "seat"})
+    assert [e["id"] for e in r.json()] == ["ev-late"]
+
+
+def test_journal_recovers_spooled_events_after_a_crash(client, table, tmp_path):
+    spool = tmp_path / "journal.ndjson"
+    spool.write_text(
+        '{"id":"ev-1","table_id":"%s","company_id":1,"service_date":"%s","event_type":"seat",'
+        '"from_step":null,"to_step":null,"payload":null,"actor_user_id":1,"created_at":"2026-01-01T20:15:00"}\n'
+        % (table["id"], table["service_date"])
+    )
+    journal = EventJournal()
+    journal.start(TestingSessionLocal, str(spool))
+    journal.stop()
+
+    assert journal.recovered == 1
+    assert spool.read_text() == ""
+    r = client.get("/api/service/events/search", params={"event_type": "seat"})
+    assert [e["id"] for e in r.json()] == ["ev-1"]
+
+
+def test_table_state_at_a_point_in_time(client, table, monkeypatch):
+    monkeypatch.setattr(crud, "SNAPSHOT_EVERY", 4)
+    url = f"/api/service/tables/{table['id']}"
+    guest_id, wine_id = seed_detail(client, table["id"])
+    client.patch(url, json={"notes": "anniversary"})
+    client.post(f"{url}/next")
+
+    before = datetime.utcnow()
+    client.patch(f"{url}/guests/{guest_id}", json={"allergy": "nuts"})
+    client.delete(f"{url}/wines/{wine_id}")
+    for _ in range(3):
+        client.post(f"{url}/next")
+    client.post(f"{url}/undo")
+    now = client.get(url).json()
+
+    db = TestingSessionLocal()
+    try:
+        assert db.query(ServiceTableSnapshot).count() >= 2
+    finally:
+        db.close()
+
+    r = client.get(f"{url}/at", params={"ts": datetime.utcnow().isoformat()})
+    assert r.status_code == 200, r.text
+    at = r.json()
+    assert at["step_index"] == now["step_index"] == 3
+    assert (at["undo_depth"], at["redo_depth"]) == (3, 1)
+    assert at["notes"] == "anniversary"
+    assert sorted((g["name"], g["allergy"]) for g in at["guests"]) == [("Ann", "nuts"), ("Bob", None)]
+    assert at["wines"] == []
+
+    r = client.get(f"{url}/at", params={"ts": before.isoformat()})
+    at = r.json()
+    assert at["step_index"] == 1 and at["arrived_at"]
+    assert [w["label"] for w in at["wines"]] == ["Barolo 2016"]
+    assert all(g["allergy"] is None for g in at["guests"])
+
+    r = client.get(f"{url}/at", params={"ts": "2000-01-01T00:00:00"})
+    assert r.status_code == 404
+
+
+def test_close_out_completes_open_tables_in_one_update(client, table):
+    other = client.post("/api/service/tables", json={"table_number": "15", "turn": 1}).json()
+    client.post(f"/api/service/tables/{other['id']}/complete")
+
+    with count_queries() as q:
+        r = client.post("/api/service/close-out")
+    assert r.status_code == 200, r.text
+    assert r.json()["table_ids"] == [table["id"]]
+    updates = [s for s in q["statements"] if s.lstrip().upper().startswith("UPDATE")]
+    assert len(updates) == 1
+
+    assert client.get("/api/service/tables").json()["items"] == []
+    r = client.get("/api/service/events/search", params={"table_id": table["id"], "event_type": "complete"})
+    assert r.json()[0]["payload"] == {"closed_out": True}
+    assert client.post("/api/service/close-out").json()["closed"] == 0
+
+
+def test_rollover_closes_only_past_days(client, table):
+    today = client.post("/api/service/tables", json={"table_number": "15", "turn": 1}).json()
+    db = TestingSessionLocal()
+    try:
+        db.query(ServiceTable).filter(ServiceTable.id == table["id"]).update(
+            {ServiceTable.service_date: date.today() - timedelta(days=1)}
+        )
+        db.commit()
+        closed = crud.close_out_before(db, date.today())
+        assert list(closed.values()) == [1]
+        statuses = dict(db.query(ServiceTable.id, ServiceTable.status))
+    finally:
+        db.close()
+    assert statuses == {table["id"]: "completed", today["id"]: "open"}
+
+
+def test_service_day_follows_company_timezone_and_cutoff():
+    at = datetime(2024, 3, 9, 7, 30, tzinfo=timezone.utc)  # 02:30 in New York
+    assert crud.company_service_day("America/New_York", 4, now=at) == date(2024, 3, 8)
+    assert crud.company_service_day("America/New_York", 0, now=at) == date(2024, 3, 9)
+    assert crud.company_service_day("UTC", 4, now=at) == date(2024, 3, 9)
+
+
+def test_tables_are_scoped_to_a_service_day(client, table):
+    tomorrow = (datetime.now(timezone.utc).date() + timedelta(days=1)).isoformat()
+    r = client.post("/api/service/tables", params={"service_date": tomorrow}, json={"table_number": "14", "turn": 1})
+    assert r.status_code == 200, r.text
+    ahead = r.json()
+    assert ahead["service_date"] == tomorrow
+
+    assert [t["id"] for t in client.get("/api/service/tables").json()["items"]] == [table["id"]]
+    items = client.get("/api/service/tables", params={"service_date": tomorrow}).json()["items"]
+    assert [t["id"] for t in items] == [ahead["id"]]
+
+    assert [t["id"] for t in client.get("/api/service/changes").json()["tables"]] == [table["id"]]
+    r = client.get("/api/service/changes", params={"service_date": tomorrow})
+    assert [t["id"] for t in r.json()["tables"]] == [ahead["id"]]
+
+    # the default day comes from the company's settings
+    db = TestingSessionLocal()
+    try:
+        assert crud.current_service_day(db, 1) == datetime.now(timezone.utc).date()
+    finally:
+        db.close()
+
+
+def test_concurrent_taps_run_on_the_event_loop(client, table):
+    async def scenario():
+        threads = set()
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            threads.add(threading.current_thread().name)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                url = f"/api/service/tables/{table['id']}/next"
+                responses = await asyncio.gather(*(ac.post(url) for _ in range(20)))
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+        return responses, threads, threading.current_thread().name
+
+    responses, threads, loop_thread = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200] * 20
+    assert sorted(r.json()["step_index"] for r in responses) == list(range(1, 21))
+    # no SQL ran on a threadpool worker
+    assert threads == {loop_thread}
+
+
+def test_pool_telemetry_counts_checkouts_and_timeouts(client):
+    small = create_engine(
+        f"sqlite:///{TEST_DB}",
+        connect_args={"check_same_thread": False},
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    held = small.connect()
+    with pytest.raises(exc.TimeoutError):
+        small.connect()
+    stats = pool_stats(small)
+    assert stats["checked_out"] == 1 and stats["overflow"] == 0
+    assert stats["checkouts"] == 1 and stats["timeouts"] == 1
+    held.close()
+    small.dispose()
+    # counters survive the pool being recreated
+    assert pool_stats(small)["timeouts"] == 1
+
+    r = client.get("/api/service/db/pool")
+    assert r.status_code == 200
+    # the suite's async engine is a NullPool; the sync one is pooled as configured
+    assert r.json()["async"] == {"pool": "NullPool"}
+    assert {"checked_out", "overflow", "avg_wait_ms", "timeouts"} <= set(r.json()["sync"])
+
+
+def test_sqlite_production_profile_funnels_writes_through_one_writer(tmp_path):
+    path = tmp_path / "venue.db"
+    write_engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    apply_pragmas(write_engine)
+    begin_immediate(write_engine)
+    Base.metadata.create_all(bind=write_engine)
+    WriterSessionLocal = sessionmaker(autoflush=False, expire_on_commit=False, bind=write_engine)
+
+    with write_engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        # the transaction took the write lock when it began, before writing anything
+        other = sqlite3.connect(path, timeout=0)
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            other.execute("BEGIN IMMEDIATE")
+        other.close()
+
+    db = WriterSessionLocal()
+    db.add(Company(id=1, name="Venue", service_day_cutoff_hour=0))
+    db.commit()
+    table_id = crud.create_table(db, company_id=1, table_number="1", turn=1, location=None, guest_count=2, notes=None).id
+    db.close()
+
+    writer = SQLiteWriter(WriterSessionLocal)
+
+    async def add_guest(n):
+        # read-then-write, the pattern that fails with "database is locked" on deferred transactions
+        session = writer.session()
+        try:
+            t = await crud_async.get_table_detail(session, table_id, 1)
+            return await crud_async.add_guest(session, t, {"name": f"guest {n}"}, None)
+        finally:
+            await session.close()
+
+    async def scenario():
+        return await asyncio.gather(*(add_guest(n) for n in range(20)))
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        writer.stop()
+    assert sorted(t.version for t in results) == list(range(2, 22))
+
+    db = WriterSessionLocal()
+    try:
+        assert len(crud.get_table_detail(db, table_id, 1).guests) == 20
+    finally:
+        db.close()
+    write_engine.dispose()
+
+
+def test_background_writers_share_the_sqlite_writer_connection(tmp_path):
+    venue = Database().configure(f"sqlite:///{tmp_path / 'venue.db'}", sqlite_profile="production")
+    try:
+        # journal flusher, rollover and scripts write through WriteSessionLocal
+        assert venue.WriteSessionLocal.kw["bind"] is venue.write_engine
+        assert venue.sqlite_writer.session_factory is venue.WriteSessionLocal
+        Base.metadata.create_all(bind=venue.engine)
+        held = venue.WriteSessionLocal()
+        held.add(Company(id=1, name="Venue"))
+        held.flush()
+        # the writer's only connection is taken: a second writer waits instead of racing for the lock
+        assert pool_stats(venue.write_engine)["checked_out"] == 1
+        held.commit()
+        held.close()
+        assert pool_stats(venue.write_engine)["checked_out"] == 0
+    finally:
+        asyncio.run(venue.aclose())
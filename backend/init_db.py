@@ -2,6 +2,7 @@
 """Initialize the database with tables and seed data."""
 
 from app.db import engine, SessionLocal
+from app.db.upgrades import upgrade
 from app.models.base import Base
 from app.models.user import User
 from app.models.wine import Wine
@@ -17,6 +18,8 @@ def init_database():
     """Create all tables."""
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    # create_all leaves existing tables alone; add columns they're missing
+    upgrade(engine)
     print("✓ Database tables created")
 
 def seed_users():
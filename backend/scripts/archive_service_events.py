@@ -0,0 +1,41 @@
+# backend/scripts/archive_service_events.py
+"""
+Move closed service days out of service_step_events into
+<EVENT_ARCHIVE_DIR>/<company_id>/<YYYY-MM-DD>.ndjson.gz.
+
+Run from backend/ (e.g. nightly from cron):
+    py -m scripts.archive_service_events [--before YYYY-MM-DD]
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import date
+
+import app.models.user  # noqa: F401
+import app.models.company  # noqa: F401
+import app.models.inventory  # noqa: F401
+import app.models.service  # noqa: F401
+
+from app.db import WriteSessionLocal
+from app.services.event_archive import archive_closed_days
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--before", type=date.fromisoformat, default=None, help="archive days before this date (default: each company's current service day)")
+    args = parser.parse_args()
+
+    db = WriteSessionLocal()
+    try:
+        archived = archive_closed_days(db, before=args.before)
+    finally:
+        db.close()
+
+    for (company_id, service_date), count in archived.items():
+        print(f"company {company_id} {service_date}: {count} events archived")
+    if not archived:
+        print("Nothing to archive")
+
+
+if __name__ == "__main__":
+    main()
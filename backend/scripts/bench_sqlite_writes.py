@@ -0,0 +1,130 @@
+# backend/scripts/bench_sqlite_writes.py
+"""
+Write throughput of SQLite under concurrent floor traffic, default driver
+settings vs SQLITE_PROFILE=production (WAL + pragmas + single writer).
+
+Every client owns one table and runs a mix of step taps, guest adds (a
+read-then-write transaction) and detail reads through the async crud path,
+all clients at once. Each profile runs against a fresh database file.
+
+Run from backend/:
+    py -m scripts.bench_sqlite_writes [--clients 32] [--ops 60]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import app.models.user  # noqa: F401
+import app.models.company  # noqa: F401
+import app.models.inventory  # noqa: F401
+import app.models.service  # noqa: F401
+
+from app.crud import service as crud
+from app.crud import service_async as crud_async
+from app.db import Base, Database
+from app.models.company import Company
+
+PROFILES = ("default", "production")
+
+
+def seed(path: str, clients: int) -> list:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Company.__table__.insert().values(id=1, name="Bench", service_day_cutoff_hour=0))
+    db = Session(bind=engine, expire_on_commit=False)
+    try:
+        ids = [
+            crud.create_table(db, company_id=1, table_number=str(n), turn=1, location=None, guest_count=2, notes=None).id
+            for n in range(1, clients + 1)
+        ]
+    finally:
+        db.close()
+        engine.dispose()
+    return ids
+
+
+def sessions(path: str, profile: str):
+    """A registry for `path` configured as app.db configures it: (database, reader factory, writer factory)."""
+    db = Database().configure(f"sqlite:///{path}", sqlite_profile=profile)
+    writer = db.sqlite_writer.session if db.sqlite_writer is not None else db.AsyncSessionLocal
+    return db, db.AsyncSessionLocal, writer
+
+
+async def client(table_id: str, ops: int, Reader, Writer, latencies: list, counts: dict):
+    rnd = random.Random(table_id)
+    for i in range(ops):
+        kind = rnd.choices(("tap", "guest", "read"), weights=(4, 4, 2))[0]
+        started = time.perf_counter()
+        try:
+            if kind == "read":
+                async with Reader() as db:
+                    await crud_async.get_table_detail(db, table_id, 1)
+            else:
+                db = Writer()
+                try:
+                    if kind == "tap":
+                        await crud_async.advance_step(db, table_id, 1, None)
+                    else:
+                        t = await crud_async.get_table_detail(db, table_id, 1)
+                        await crud_async.add_guest(db, t, {"name": f"guest {i}"}, None)
+                finally:
+                    await db.close()
+        except OperationalError:
+            counts["locked"] += 1
+            continue
+        if kind != "read":
+            counts["writes"] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run(profile: str, clients: int, ops: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    table_ids = seed(path, clients)
+    database, Reader, Writer = sessions(path, profile)
+    latencies: list = []
+    counts = {"writes": 0, "locked": 0}
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(t, ops, Reader, Writer, latencies, counts) for t in table_ids))
+    elapsed = time.perf_counter() - started
+
+    await database.aclose()
+    latencies.sort()
+    return {
+        "profile": profile,
+        "writes": counts["writes"],
+        "locked": counts["locked"],
+        "writes_per_s": counts["writes"] / elapsed,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent clients (one table each)")
+    parser.add_argument("--ops", type=int, default=60, help="operations per client")
+    args = parser.parse_args()
+
+    print(f"{'profile':<12}{'writes':>8}{'locked':>8}{'writes/s':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for profile in PROFILES:
+        r = asyncio.run(run(profile, args.clients, args.ops))
+        print(
+            f"{r['profile']:<12}{r['writes']:>8}{r['locked']:>8}{r['writes_per_s']:>10.0f}"
+            f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,4 @@
 # backend/scripts/seed_dev.py
-from __future__ import annotations
-
 """
 Dev seed script.
 
@@ -9,6 +7,7 @@ IMPORTANT:
     py -m scripts.seed_dev
 - This file intentionally imports models to ensure SQLAlchemy mapper registry is populated.
 """
+from __future__ import annotations
 
 import os
 from datetime import date
@@ -0,0 +1,12 @@
+# Run from backend/:  py tools/migrate_add_undo_depth.py
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from app.db import engine  # noqa: E402
+from app.db.upgrades import add_undo_redo_depth  # noqa: E402
+
+count = add_undo_redo_depth(engine)
+print(f"✅ undo_depth/redo_depth in place, {count} in-progress tables backfilled")